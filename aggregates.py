@@ -0,0 +1,257 @@
+import logging
+from datetime import datetime
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+from models import AccountAggregate, UserAggregate, TradingAccount, Share, LatestQuote, db
+from portfolio import summary_from_totals
+
+logger = logging.getLogger(__name__)
+
+# Float drift allowed before the checker reports a mismatch
+TOLERANCE = 0.01
+
+def _computed_totals(user_ids=None):
+    """Recompute {account_id: (user_id, investment, value)} from holdings in one query"""
+    price = db.func.coalesce(LatestQuote.current_price, Share.buying_price)
+    query = db.session.query(
+        TradingAccount.id,
+        TradingAccount.user_id,
+        db.func.coalesce(db.func.sum(Share.quantity * Share.buying_price), 0),
+        db.func.coalesce(db.func.sum(Share.quantity * price), 0)
+    ).outerjoin(Share, Share.account_id == TradingAccount.id)\
+        .outerjoin(LatestQuote, LatestQuote.share_name == Share.name)\
+        .group_by(TradingAccount.id, TradingAccount.user_id)
+    if user_ids is not None:
+        query = query.filter(TradingAccount.user_id.in_(user_ids))
+    return {account_id: (user_id, investment, value) for account_id, user_id, investment, value in query}
+
+def _locked_totals(user_id):
+    """Recompute {account_id: (investment, value)} for one user at locked quote prices.
+
+    Quote rows are locked in name order before any aggregate row, the order
+    the quote writers take them in (_upsert_latest, then apply_price_changes).
+    A concurrent price change therefore either commits first, and its price
+    is read here, or waits for the rebuild and applies its delta on top.
+    """
+    holdings = db.session.query(
+        Share.account_id,
+        Share.name,
+        db.func.sum(Share.quantity),
+        db.func.sum(Share.quantity * Share.buying_price)
+    ).join(TradingAccount)\
+        .filter(TradingAccount.user_id == user_id)\
+        .group_by(Share.account_id, Share.name)\
+        .all()
+    names = sorted({name for _, name, _, _ in holdings})
+    prices = dict(
+        db.session.query(LatestQuote.share_name, LatestQuote.current_price)
+        .filter(LatestQuote.share_name.in_(names))
+        .order_by(LatestQuote.share_name)
+        .with_for_update()
+    ) if names else {}
+
+    totals = {account_id: (0, 0) for (account_id,) in
+              db.session.query(TradingAccount.id).filter_by(user_id=user_id)}
+    for account_id, name, quantity, cost in holdings:
+        price = prices.get(name)
+        investment, value = totals[account_id]
+        totals[account_id] = (investment + cost, value + (quantity * price if price is not None else cost))
+    return totals
+
+def rebuild_user(user_id):
+    """Recompute one user's aggregate rows from scratch"""
+    totals = _locked_totals(user_id)
+    stored = {row.account_id: row for row in AccountAggregate.query.filter_by(user_id=user_id)
+              .order_by(AccountAggregate.account_id)
+              .populate_existing()
+              .with_for_update()}
+
+    for account_id, (investment, value) in totals.items():
+        row = stored.pop(account_id, None)
+        if row is None:
+            row = AccountAggregate(account_id=account_id, user_id=user_id)
+            db.session.add(row)
+        row.total_investment = investment
+        row.current_value = value
+    for row in stored.values():
+        db.session.delete(row)
+
+    user_row = db.session.get(UserAggregate, user_id, with_for_update=True, populate_existing=True)
+    if user_row is None:
+        user_row = UserAggregate(user_id=user_id)
+        db.session.add(user_row)
+    user_row.total_investment = sum(investment for investment, _ in totals.values())
+    user_row.current_value = sum(value for _, value in totals.values())
+    db.session.flush()
+
+def apply_holding_change(user_id, account_id, investment_delta, value_delta):
+    """Apply a holding add/remove to the account and user totals.
+
+    Call after the change has been flushed. If the user has no aggregate
+    rows yet they are rebuilt from scratch, which already includes it.
+    """
+    db.session.flush()
+    account_row = db.session.get(AccountAggregate, account_id)
+    if account_row is None or db.session.get(UserAggregate, user_id) is None:
+        rebuild_user(user_id)
+        return
+    _bump(AccountAggregate, AccountAggregate.account_id, [(account_id, investment_delta, value_delta)])
+    _bump(UserAggregate, UserAggregate.user_id, [(user_id, investment_delta, value_delta)])
+
+def on_account_added(account):
+    db.session.flush()
+    if db.session.get(UserAggregate, account.user_id) is None:
+        rebuild_user(account.user_id)
+    else:
+        db.session.add(AccountAggregate(account_id=account.id, user_id=account.user_id))
+        db.session.flush()
+
+def _locked_price(share):
+    """The share's current price, read with a lock on its quote row.
+
+    A concurrent quote update then either finishes first (and this sees
+    its price) or waits for this transaction (and revalues the holding
+    itself), so the change is never counted twice or missed.
+    """
+    quote = LatestQuote.query.filter_by(share_name=share.name).with_for_update().first()
+    return quote.current_price if quote else share.buying_price
+
+def on_share_added(share, user_id):
+    value = share.quantity * _locked_price(share)
+    apply_holding_change(user_id, share.account_id, share.quantity * share.buying_price, value)
+
+def on_share_removed(share, user_id):
+    value = share.quantity * _locked_price(share)
+    apply_holding_change(user_id, share.account_id, -share.quantity * share.buying_price, -value)
+
+def on_account_removed(account):
+    """Take an account's totals off its user; call before deleting the account"""
+    row = db.session.get(AccountAggregate, account.id)
+    if row is None:
+        return
+    _bump(UserAggregate, UserAggregate.user_id,
+          [(account.user_id, -row.total_investment, -row.current_value)])
+    db.session.delete(row)
+    db.session.flush()
+
+def _bump(model, key_column, deltas):
+    """Add (key, investment_delta, value_delta) deltas with one executemany UPDATE"""
+    if not deltas:
+        return
+    table = model.__table__
+    statement = table.update()\
+        .where(table.c[key_column.key] == bindparam('key'))\
+        .values(
+            total_investment=table.c.total_investment + bindparam('investment_delta'),
+            current_value=table.c.current_value + bindparam('value_delta'),
+            updated_at=bindparam('now')
+        )
+    now = datetime.utcnow()
+    db.session.connection().execute(statement, [
+        {'key': key, 'investment_delta': investment, 'value_delta': value, 'now': now}
+        for key, investment, value in deltas
+    ])
+
+def apply_price_changes(changes):
+    """Revalue holdings for {symbol: (old_price, new_price)} quote updates.
+
+    ``old_price`` is None when the symbol had no quote, in which case its
+    holdings were valued at their buying price. Runs one grouped query
+    for all affected accounts and two batched UPDATEs.
+    """
+    changes = {symbol: prices for symbol, prices in changes.items() if prices[0] != prices[1]}
+    if not changes:
+        return
+
+    rows = db.session.query(
+        Share.account_id,
+        TradingAccount.user_id,
+        Share.name,
+        db.func.sum(Share.quantity),
+        db.func.sum(Share.quantity * Share.buying_price)
+    ).join(TradingAccount)\
+        .filter(Share.name.in_(changes))\
+        .group_by(Share.account_id, TradingAccount.user_id, Share.name)\
+        .all()
+
+    account_deltas = {}
+    user_deltas = {}
+    for account_id, user_id, name, quantity, cost in rows:
+        old_price, new_price = changes[name]
+        old_value = quantity * old_price if old_price is not None else cost
+        delta = quantity * new_price - old_value
+        account_deltas[account_id] = account_deltas.get(account_id, 0) + delta
+        user_deltas[user_id] = user_deltas.get(user_id, 0) + delta
+
+    _bump(AccountAggregate, AccountAggregate.account_id,
+          [(account_id, 0, delta) for account_id, delta in account_deltas.items()])
+    _bump(UserAggregate, UserAggregate.user_id,
+          [(user_id, 0, delta) for user_id, delta in user_deltas.items()])
+
+def load_summaries(user_id):
+    """Return (portfolio_summary, total_portfolio) from the aggregate rows.
+
+    Rebuilds the user's rows first if any account is missing one.
+    """
+    account_ids = [account_id for (account_id,) in db.session.query(TradingAccount.id).filter_by(user_id=user_id)]
+    rows = {row.account_id: row for row in AccountAggregate.query.filter_by(user_id=user_id)}
+    user_row = db.session.get(UserAggregate, user_id)
+    if user_row is None or set(rows) != set(account_ids):
+        try:
+            rebuild_user(user_id)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request created the same rows first; use those
+            db.session.rollback()
+        rows = {row.account_id: row for row in AccountAggregate.query.filter_by(user_id=user_id)}
+        user_row = db.session.get(UserAggregate, user_id)
+
+    portfolio_summary = {
+        account_id: summary_from_totals(row.total_investment, row.current_value)
+        for account_id, row in rows.items()
+    }
+    return portfolio_summary, summary_from_totals(user_row.total_investment, user_row.current_value)
+
+def check_aggregates(fix=False):
+    """Compare stored aggregates with a from-scratch rebuild.
+
+    Returns a list of (kind, id, stored, computed) mismatches, where the
+    values are (investment, value) pairs. With ``fix`` the affected users
+    are rebuilt.
+    """
+    totals = _computed_totals()
+    mismatches = []
+    bad_users = set()
+
+    def differs(stored, computed):
+        return stored is None or any(abs(a - b) > TOLERANCE for a, b in zip(stored, computed))
+
+    stored_accounts = {row.account_id: row for row in AccountAggregate.query}
+    user_totals = {}
+    for account_id, (user_id, investment, value) in totals.items():
+        row = stored_accounts.pop(account_id, None)
+        stored = (row.total_investment, row.current_value) if row else None
+        if differs(stored, (investment, value)):
+            mismatches.append(('account', account_id, stored, (investment, value)))
+            bad_users.add(user_id)
+        previous = user_totals.get(user_id, (0, 0))
+        user_totals[user_id] = (previous[0] + investment, previous[1] + value)
+    for account_id, row in stored_accounts.items():
+        mismatches.append(('account', account_id, (row.total_investment, row.current_value), None))
+        bad_users.add(row.user_id)
+
+    for row in UserAggregate.query:
+        computed = user_totals.pop(row.user_id, (0, 0))
+        if differs((row.total_investment, row.current_value), computed):
+            mismatches.append(('user', row.user_id, (row.total_investment, row.current_value), computed))
+            bad_users.add(row.user_id)
+    for user_id, computed in user_totals.items():
+        mismatches.append(('user', user_id, None, computed))
+        bad_users.add(user_id)
+
+    if fix and bad_users:
+        for user_id in bad_users:
+            rebuild_user(user_id)
+        db.session.commit()
+        logger.info(f"Rebuilt aggregates for {len(bad_users)} users")
+    return mismatches
@@ -0,0 +1,176 @@
+import bisect
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import render_template
+from flask_mail import Message
+from models import PriceAlert, User, db
+from extensions import mail_outbox
+
+logger = logging.getLogger(__name__)
+
+ALERT_SENDER = 'noreply@shareportfolio.com'
+
+# How far before the newest synced rule each sync looks again, so rules whose
+# transactions committed late (after a newer rule was synced) aren't missed
+SYNC_OVERLAP = timedelta(minutes=2)
+
+class AlertIndex:
+    """Per-symbol sorted price thresholds of the active alert rules.
+
+    Every rule adds a (target, rule_id) entry to the symbol's ``above``
+    list, its ``below`` list, or both (percentage moves). Above-rules fire
+    once the price reaches their target and below-rules once it falls to
+    it, so a quote bisects each list once and only visits the entries it
+    crosses. Fired rules are dropped from the index.
+    """
+
+    def __init__(self):
+        self._above = {}  # symbol -> sorted [(target, rule_id)]
+        self._below = {}
+        self._entries = {}  # rule_id -> [(side, symbol, target)]
+        self._lock = threading.Lock()
+        self.synced_until = None  # created_at of the newest synced rule
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, rule_id, symbol, above=None, below=None):
+        """Index a rule; returns False if it is already indexed"""
+        with self._lock:
+            if rule_id in self._entries:
+                return False
+            entries = []
+            for side, target in ((self._above, above), (self._below, below)):
+                if target is None:
+                    continue
+                bisect.insort(side.setdefault(symbol, []), (target, rule_id))
+                entries.append((side, symbol, target))
+            self._entries[rule_id] = entries
+            return True
+
+    def remove(self, rule_id):
+        with self._lock:
+            self._discard(rule_id)
+
+    def _discard(self, rule_id):
+        for side, symbol, target in self._entries.pop(rule_id, ()):
+            entries = side.get(symbol)
+            if not entries:
+                continue
+            index = bisect.bisect_left(entries, (target, rule_id))
+            if index < len(entries) and entries[index] == (target, rule_id):
+                del entries[index]
+            if not entries:
+                del side[symbol]
+
+    def match(self, symbol, price):
+        """Remove and return the ids of the rules ``price`` crosses"""
+        fired = []
+        with self._lock:
+            above = self._above.get(symbol)
+            if above:
+                end = bisect.bisect_right(above, (price, float('inf')))
+                fired.extend(rule_id for _, rule_id in above[:end])
+                del above[:end]
+                if not above:
+                    del self._above[symbol]
+            below = self._below.get(symbol)
+            if below:
+                start = bisect.bisect_left(below, (price, float('-inf')))
+                fired.extend(rule_id for _, rule_id in below[start:])
+                del below[start:]
+                if not below:
+                    del self._below[symbol]
+            # Also drops the other side of fired percentage-move rules
+            for rule_id in fired:
+                self._discard(rule_id)
+        return fired
+
+    def reset(self):
+        """Forget every rule so the next sync reloads them all"""
+        with self._lock:
+            self._above.clear()
+            self._below.clear()
+            self._entries.clear()
+            self.synced_until = None
+
+    def sync(self):
+        """Load active rules created since the last sync, by this or another process.
+
+        Rules are picked up by ``created_at`` rather than id, re-reading the
+        last SYNC_OVERLAP each time: ids are handed out before commit, so a
+        rule can become visible after a higher id was already synced.
+        """
+        query = db.session.query(PriceAlert.id, PriceAlert.share_name, PriceAlert.above_price,
+                                 PriceAlert.below_price, PriceAlert.created_at)\
+            .filter(PriceAlert.triggered_at.is_(None))
+        since = self.synced_until
+        if since is not None:
+            query = query.filter(PriceAlert.created_at >= since - SYNC_OVERLAP)
+        added = 0
+        for rule_id, symbol, above, below, created_at in query.order_by(PriceAlert.created_at).all():
+            if self.add(rule_id, symbol, above, below):
+                added += 1
+            if created_at is not None and (since is None or created_at > since):
+                since = created_at
+        self.synced_until = since
+        return added
+
+# Shared by every quote writer in this process
+alert_index = AlertIndex()
+
+def thresholds(kind, value, reference_price):
+    """(above_price, below_price) for a new rule, given the current price"""
+    if kind == 'cross':
+        return (value, None) if value > reference_price else (None, value)
+    below = reference_price * (1 - value / 100)
+    return reference_price * (1 + value / 100), below if below > 0 else None
+
+def send_alert_email(user, alert, price):
+    msg = Message(f'Price Alert: {alert.share_name}',
+                 sender=ALERT_SENDER,
+                 recipients=[user.email])
+    msg.html = render_template('emails/price_alert.html',
+                             user=user,
+                             alert=alert,
+                             price=price,
+                             year=datetime.utcnow().year)
+    mail_outbox.send(msg)
+
+def check_alerts(prices):
+    """Fire and email the alerts crossed by a batch of quotes.
+
+    ``prices`` is {symbol: price} or a time-ordered list of (symbol, price).
+    """
+    alert_index.sync()
+    fired = {}
+    for symbol, price in (prices.items() if isinstance(prices, dict) else prices):
+        for rule_id in alert_index.match(symbol, price):
+            fired[rule_id] = price
+    if not fired:
+        return 0
+
+    now = datetime.utcnow()
+    triggered = []
+    try:
+        candidates = db.session.query(PriceAlert, User).join(User)\
+            .filter(PriceAlert.id.in_(fired), PriceAlert.triggered_at.is_(None))\
+            .all()
+        for alert, user in candidates:
+            # Claim the rule so another process that also matched it stays quiet
+            claimed = PriceAlert.query.filter_by(id=alert.id, triggered_at=None)\
+                .update({'triggered_at': now, 'triggered_price': fired[alert.id]}, synchronize_session=False)
+            if claimed:
+                triggered.append((alert, user))
+        db.session.commit()
+    except Exception:
+        # The matched rules already left the index; reload them next time
+        alert_index.reset()
+        raise
+
+    for alert, user in triggered:
+        send_alert_email(user, alert, fired[alert.id])
+    if triggered:
+        logger.info(f"Triggered {len(triggered)} price alerts")
+    return len(triggered)
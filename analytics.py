@@ -0,0 +1,303 @@
+"""Batch portfolio analytics on NumPy arrays.
+
+A user's holdings and the daily closes of every symbol they hold are
+loaded with a handful of queries into column arrays and a (days x
+symbols) price matrix, and each metric is computed over whole arrays
+rather than one Share at a time.
+"""
+import csv
+import logging
+import math
+import warnings
+from datetime import datetime, timedelta
+from functools import lru_cache
+import numpy as np
+from models import Share, TradingAccount, LatestQuote, PriceBar, SharePrice, db
+from share_scraper import NIFTY_INDEX_SYMBOL
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+DEFAULT_HISTORY_DAYS = 5 * 365
+UNCLASSIFIED = 'Unclassified'
+XIRR_MAX_ITERATIONS = 100
+XIRR_TOLERANCE = 1e-10
+
+class _quiet(warnings.catch_warnings):
+    """Silence NumPy's empty-slice and divide warnings; NaN is the answer there"""
+
+    def __enter__(self):
+        super().__enter__()
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+# --- Loading ---------------------------------------------------------------
+
+def load_holdings(user_id):
+    """Return a user's holdings as a dict of equal-length column arrays"""
+    rows = db.session.query(
+        Share.account_id,
+        Share.name,
+        Share.quantity,
+        Share.buying_price,
+        Share.created_at,
+        LatestQuote.current_price
+    ).join(TradingAccount)\
+        .outerjoin(LatestQuote, LatestQuote.share_name == Share.name)\
+        .filter(TradingAccount.user_id == user_id)\
+        .all()
+
+    now = datetime.utcnow()
+    buying_price = np.array([row[3] for row in rows], dtype=float)
+    price = np.array([row[5] if row[5] is not None else np.nan for row in rows], dtype=float)
+    return {
+        'account_id': np.array([row[0] for row in rows], dtype=np.int64),
+        'symbol': np.array([row[1] for row in rows], dtype=str),
+        'quantity': np.array([row[2] for row in rows], dtype=float),
+        'buying_price': buying_price,
+        'bought_at': np.array([row[4] or now for row in rows], dtype='datetime64[D]'),
+        # Unquoted holdings are valued at cost, as Share.current_price does
+        'price': np.where(np.isnan(price), buying_price, price)
+    }
+
+def _last_per_day(model, time_column, price_column, symbols, start, *criteria):
+    """(symbol, time, price) of the last row per symbol and day"""
+    last = db.session.query(
+        model.share_name.label('name'),
+        db.func.max(time_column).label('at')
+    ).filter(model.share_name.in_(symbols), time_column >= start, *criteria)\
+        .group_by(model.share_name, db.func.date(time_column))\
+        .subquery()
+    return db.session.query(model.share_name, time_column, price_column)\
+        .join(last, db.and_(model.share_name == last.c.name, time_column == last.c.at))\
+        .filter(*criteria)\
+        .order_by(time_column)\
+        .all()
+
+def load_daily_closes(symbols, start):
+    """Return (dates, closes) for ``symbols`` since ``start``.
+
+    ``closes`` has one row per trading day and one column per symbol, in
+    the order given. Daily bars, minute bars and raw ticks are combined
+    (the finest source wins for a day) and gaps are forward filled;
+    days before a symbol's first price stay NaN.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return np.array([], dtype='datetime64[D]'), np.empty((0, 0))
+
+    rows = db.session.query(PriceBar.share_name, PriceBar.bucket_start, PriceBar.close)\
+        .filter(PriceBar.interval == '1d', PriceBar.share_name.in_(symbols), PriceBar.bucket_start >= start)\
+        .all()
+    rows += _last_per_day(PriceBar, PriceBar.bucket_start, PriceBar.close, symbols, start,
+                          PriceBar.interval == '1m')
+    rows += _last_per_day(SharePrice, SharePrice.last_updated, SharePrice.current_price, symbols, start)
+    if not rows:
+        return np.array([], dtype='datetime64[D]'), np.empty((0, len(symbols)))
+
+    column = {symbol: index for index, symbol in enumerate(symbols)}
+    days = np.array([row[1] for row in rows], dtype='datetime64[D]')
+    dates, day_index = np.unique(days, return_inverse=True)
+    closes = np.full((len(dates), len(symbols)), np.nan)
+    # Later rows come from finer sources and overwrite coarser ones
+    closes[day_index, [column[row[0]] for row in rows]] = [row[2] for row in rows]
+    return dates, _ffill(closes)
+
+@lru_cache(maxsize=8)
+def load_sector_map(path):
+    """Read a ``symbol,sector`` CSV file; returns {} when unset or unreadable"""
+    if not path:
+        return {}
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            return {row[0].strip(): row[1].strip() for row in csv.reader(f) if len(row) >= 2}
+    except OSError as e:
+        logger.error(f"Error reading sector map {path}: {e}")
+        return {}
+
+# --- Array metrics ----------------------------------------------------------
+
+def _ffill(values):
+    """Forward fill NaNs down each column"""
+    if not values.size:
+        return values
+    index = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(index, axis=0, out=index)
+    return values[index, np.arange(values.shape[1])]
+
+def daily_returns(closes):
+    """Simple day-over-day returns down each column (one row shorter)"""
+    with _quiet():
+        return closes[1:] / closes[:-1] - 1
+
+def volatility(returns):
+    """Annualised standard deviation of daily returns per column"""
+    with _quiet():
+        return np.nanstd(returns, axis=0, ddof=1) * math.sqrt(TRADING_DAYS)
+
+def max_drawdown(closes):
+    """Largest peak-to-trough fall per column, as a positive fraction"""
+    with _quiet():
+        peaks = np.fmax.accumulate(closes, axis=0)
+        return np.nanmax(1 - closes / peaks, axis=0)
+
+def beta(returns, benchmark_returns):
+    """Beta of each column of ``returns`` against ``benchmark_returns``.
+
+    Only days where both series have a return are used, per column.
+    """
+    mask = np.isfinite(returns) & np.isfinite(benchmark_returns)[:, None]
+    count = mask.sum(axis=0)
+    asset = np.where(mask, returns, 0)
+    market = np.where(mask, benchmark_returns[:, None], 0)
+    with _quiet():
+        asset = np.where(mask, asset - asset.sum(axis=0) / count, 0)
+        market = np.where(mask, market - market.sum(axis=0) / count, 0)
+        result = (asset * market).sum(axis=0) / (market * market).sum(axis=0)
+    result[count < 2] = np.nan
+    return result
+
+def xirr(amounts, dates, groups=None, n_groups=1):
+    """Annualised internal rate of return of each group of cash flows.
+
+    ``amounts`` are negative for money invested and positive for money
+    returned, on ``dates`` (datetime64). Newton's method runs for every
+    group at once; groups without both signs, or that do not converge,
+    give NaN.
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    if groups is None:
+        groups = np.zeros(len(amounts), dtype=np.int64)
+    rates = np.full(n_groups, np.nan)
+    if not len(amounts):
+        return rates
+
+    years = (dates - dates.min()).astype('timedelta64[D]').astype(float) / 365.0
+    has_inflow = np.bincount(groups, amounts < 0, n_groups) > 0
+    has_outflow = np.bincount(groups, amounts > 0, n_groups) > 0
+
+    rate = np.full(n_groups, 0.1)
+    converged = np.zeros(n_groups, dtype=bool)
+    with _quiet():
+        for _ in range(XIRR_MAX_ITERATIONS):
+            base = 1 + rate[groups]
+            discounted = amounts * base ** -years
+            value = np.bincount(groups, discounted, n_groups)
+            slope = np.bincount(groups, -years * discounted / base, n_groups)
+            step = np.where(slope != 0, value / slope, 0)
+            rate = np.maximum(rate - step, -0.9999)
+            converged = np.abs(step) < XIRR_TOLERANCE
+            if converged.all():
+                break
+    # A zero slope means all of a group's flows fall on one day
+    ok = has_inflow & has_outflow & converged & (slope != 0) & np.isfinite(rate)
+    rates[ok] = rate[ok]
+    return rates
+
+def weights(values, keys):
+    """{key: share of the total value} for values grouped by key"""
+    labels, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, values, len(labels))
+    total = totals.sum()
+    fractions = totals / total if total else np.zeros(len(labels))
+    return dict(zip(labels.tolist(), fractions.tolist()))
+
+def portfolio_series(dates, closes, column, quantity, bought_at, buying_price):
+    """Daily portfolio value and time-weighted daily returns.
+
+    Positions start on each holding's purchase day (or the first date);
+    a purchase counts as a cash inflow, not a gain, and symbols without a
+    price yet are valued at the buying price.
+    """
+    start = np.searchsorted(dates, bought_at)
+    in_range = start < len(dates)
+    changes = np.zeros(closes.shape)
+    np.add.at(changes, (start[in_range], column[in_range]), quantity[in_range])
+    positions = np.cumsum(changes, axis=0)
+
+    cost = np.zeros(closes.shape[1])
+    np.add.at(cost, column, quantity * buying_price)
+    held = np.zeros(closes.shape[1])
+    np.add.at(held, column, quantity)
+    with _quiet():
+        fallback = np.where(held > 0, cost / held, 0)
+    prices = np.where(np.isnan(closes), fallback, closes)
+
+    values = (positions * prices).sum(axis=1)
+    inflows = (changes * prices).sum(axis=1)
+    with _quiet():
+        returns = (values[1:] - inflows[1:]) / values[:-1] - 1
+    returns[~np.isfinite(returns)] = np.nan
+    return values, returns
+
+# --- Report -----------------------------------------------------------------
+
+def _number(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+def portfolio_analytics(user_id, sectors=None, history_days=DEFAULT_HISTORY_DAYS, as_of=None):
+    """Risk and return figures for a user's whole portfolio as plain data"""
+    as_of = as_of or datetime.utcnow()
+    holdings = load_holdings(user_id)
+    values = holdings['quantity'] * holdings['price']
+    symbols, column = np.unique(holdings['symbol'], return_inverse=True)
+
+    dates, closes = load_daily_closes(list(symbols) + [NIFTY_INDEX_SYMBOL],
+                                      as_of - timedelta(days=history_days))
+    if not len(dates):
+        dates, closes = np.array([np.datetime64(as_of, 'D')]), np.full((1, len(symbols) + 1), np.nan)
+    benchmark_returns = daily_returns(closes[:, -1])
+    closes = closes[:, :-1]
+    symbol_returns = daily_returns(closes)
+
+    # Two cash flows per holding: the purchase and its value today
+    n = len(values)
+    flow_amounts = np.concatenate([-holdings['quantity'] * holdings['buying_price'], values])
+    flow_dates = np.concatenate([holdings['bought_at'], np.full(n, np.datetime64(as_of, 'D'))])
+    account_ids, account_index = np.unique(holdings['account_id'], return_inverse=True)
+    account_xirr = xirr(flow_amounts, flow_dates, np.tile(account_index, 2), len(account_ids))
+    symbol_xirr = xirr(flow_amounts, flow_dates, np.tile(column, 2), len(symbols))
+    total_xirr = xirr(flow_amounts, flow_dates)[0]
+
+    portfolio_values, portfolio_returns = portfolio_series(
+        dates, closes, column, holdings['quantity'], holdings['bought_at'], holdings['buying_price'])
+    with _quiet():
+        growth = np.concatenate([[1.0], np.cumprod(1 + np.nan_to_num(portfolio_returns))])
+
+    symbol_volatility = volatility(symbol_returns)
+    symbol_drawdown = max_drawdown(closes)
+    symbol_beta = beta(symbol_returns, benchmark_returns)
+    symbol_weights = weights(values, holdings['symbol'])
+    sectors = sectors or {}
+
+    return {
+        'as_of': as_of.isoformat(),
+        'benchmark': NIFTY_INDEX_SYMBOL,
+        'total_value': _number(values.sum()),
+        'xirr': _number(total_xirr),
+        'volatility': _number(volatility(portfolio_returns[:, None])[0]) if len(portfolio_returns) else None,
+        'max_drawdown': _number(max_drawdown(growth[:, None])[0]),
+        'beta': _number(beta(portfolio_returns[:, None], benchmark_returns)[0]) if len(portfolio_returns) else None,
+        'daily_returns': [
+            {'date': str(day), 'return': _number(value)}
+            for day, value in zip(dates[1:], portfolio_returns)
+        ],
+        'accounts': [
+            {'id': int(account_id), 'weight': weight, 'xirr': _number(rate)}
+            for account_id, weight, rate in zip(
+                account_ids, weights(values, holdings['account_id']).values(), account_xirr)
+        ],
+        'sectors': weights(values, np.array([sectors.get(symbol, UNCLASSIFIED) for symbol in holdings['symbol']],
+                                            dtype=str)),
+        'symbols': [
+            {
+                'symbol': str(symbol),
+                'weight': symbol_weights[str(symbol)],
+                'xirr': _number(symbol_xirr[index]),
+                'volatility': _number(symbol_volatility[index]),
+                'max_drawdown': _number(symbol_drawdown[index]),
+                'beta': _number(symbol_beta[index])
+            }
+            for index, symbol in enumerate(symbols)
+        ]
+    }
@@ -1,95 +1,242 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-from flask_login import login_user, login_required, logout_user, current_user
+from flask import Flask, current_app
+from flask.cli import with_appcontext
 import os
+import csv
+import click
 from dotenv import load_dotenv
-import pymysql
-from extensions import db, mail, login_manager
+from extensions import db, mail, login_manager, market_snapshot, mail_outbox, price_broadcaster, bar_store, tick_buffer, metrics, token_store, user_cache
 
-# Load environment variables
-load_dotenv()
+DEFAULT_DATABASE_URL = 'mysql+pymysql://root:@localhost/share_portfolio'
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
+def load_config(root_path):
+    """Settings read from the environment (and .env)"""
+    # Load environment variables
+    load_dotenv()
+    return {
+        'SECRET_KEY': os.getenv('SECRET_KEY', 'your-secret-key-here'),
 
-# First create database if it doesn't exist
-def create_database():
+        # Database; the engine connects lazily, on the first query
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL', DEFAULT_DATABASE_URL),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+
+        # Mail configuration
+        'MAIL_SERVER': os.getenv('MAIL_SERVER'),
+        'MAIL_PORT': int(os.getenv('MAIL_PORT', 587)),
+        'MAIL_USE_TLS': os.getenv('MAIL_USE_TLS', 'True').lower() == 'true',
+        'MAIL_USERNAME': os.getenv('MAIL_USERNAME'),
+        'MAIL_PASSWORD': os.getenv('MAIL_PASSWORD'),
+        'MAIL_OUTBOX_BATCH_SIZE': int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', 20)),
+        'MAIL_OUTBOX_MAX_RETRIES': int(os.getenv('MAIL_OUTBOX_MAX_RETRIES', 3)),
+
+        # Home page market data cache (seconds)
+        'MARKET_SNAPSHOT_TTL': int(os.getenv('MARKET_SNAPSHOT_TTL', 300)),
+        'MARKET_SNAPSHOT_RETRY': int(os.getenv('MARKET_SNAPSHOT_RETRY', 30)),
+
+        # When a separate price worker is running, web requests only read stored prices
+        'PRICE_WORKER_ENABLED': os.getenv('PRICE_WORKER_ENABLED', 'False').lower() == 'true',
+
+        # How often the live dashboard feed checks for new quotes (seconds)
+        'PRICE_STREAM_POLL_INTERVAL': float(os.getenv('PRICE_STREAM_POLL_INTERVAL', 2)),
+
+        # Where the price worker gets quotes: scraper, breeze (tick feed) or replay (recorded file)
+        'QUOTE_SOURCE': os.getenv('QUOTE_SOURCE', 'scraper'),
+        'BREEZE_API_KEY': os.getenv('BREEZE_API_KEY'),
+        'BREEZE_API_SECRET': os.getenv('BREEZE_API_SECRET'),
+        'BREEZE_SESSION_TOKEN': os.getenv('BREEZE_SESSION_TOKEN'),
+        'BREEZE_SYMBOL_MAP': os.getenv('BREEZE_SYMBOL_MAP'),
+        'REPLAY_FILE': os.getenv('REPLAY_FILE'),
+        'REPLAY_SPEED': float(os.getenv('REPLAY_SPEED', 1)),
+        'REPLAY_LOOP': os.getenv('REPLAY_LOOP', 'False').lower() == 'true',
+
+        # Optional symbol,sector CSV used for sector weights in /api/analytics
+        'SECTOR_MAP_FILE': os.getenv('SECTOR_MAP_FILE'),
+
+        # Scraped ticks are written behind in batches of up to N rows or every T ms
+        'TICK_BUFFER_ENABLED': os.getenv('TICK_BUFFER_ENABLED', 'True').lower() == 'true',
+        'TICK_BUFFER_BATCH_SIZE': int(os.getenv('TICK_BUFFER_BATCH_SIZE', 500)),
+        'TICK_BUFFER_FLUSH_MS': int(os.getenv('TICK_BUFFER_FLUSH_MS', 200)),
+        'TICK_BUFFER_MAX_PENDING': int(os.getenv('TICK_BUFFER_MAX_PENDING', 10000)),
+
+        # Memory-mapped OHLCV history; set BAR_STORE_PATH empty to disable
+        'BAR_STORE_PATH': os.getenv('BAR_STORE_PATH', os.path.join(root_path, 'data', 'bars')),
+
+        # Request, SQL and scraper metrics served at /metrics
+        'METRICS_ENABLED': os.getenv('METRICS_ENABLED', 'True').lower() == 'true',
+
+        # Where login OTPs and verification tokens live: db, redis or memory (dev only)
+        'TOKEN_STORE': os.getenv('TOKEN_STORE', 'db'),
+        'TOKEN_STORE_URL': os.getenv('TOKEN_STORE_URL'),
+
+        # Seconds a logged-in user's row is reused across requests (0 disables)
+        'USER_CACHE_TTL': int(os.getenv('USER_CACHE_TTL', 30)),
+    }
+
+def create_app(config=None):
+    """Build the application; ``config`` overrides the environment settings.
+
+    Nothing here touches the network or the database: extensions start
+    their worker threads on first use and the scraper stack is imported
+    by the views that need it.
+    """
+    app = Flask(__name__)
+    app.config.update(load_config(app.root_path))
+    if config:
+        app.config.update(config)
+
+    # Initialize extensions with app
+    db.init_app(app)
+    mail.init_app(app)
+    mail_outbox.init_app(app)
+    login_manager.init_app(app)
+    market_snapshot.init_app(app)
+    price_broadcaster.init_app(app)
+    bar_store.init_app(app)
+    tick_buffer.init_app(app)
+    metrics.init_app(app)
+    token_store.init_app(app)
+    user_cache.init_app(app)
+    login_manager.login_view = 'main.login'
+
+    from routes import bp
+    app.register_blueprint(bp)
+
+    for command in (init_db_command, rollup_prices_command, import_bars_command,
+                    export_ticks_command, check_aggregates_command, purge_tokens_command,
+                    import_holdings_command):
+        app.cli.add_command(command)
+    return app
+
+def create_database(database_url):
+    """Create the MySQL database named in ``database_url`` if it doesn't exist"""
+    import pymysql
+    from sqlalchemy.engine import make_url
+
+    url = make_url(database_url)
+    if not url.drivername.startswith('mysql'):
+        return  # SQLite creates its own file
     try:
-        # Parse the DATABASE_URL
-        db_url = os.getenv('DATABASE_URL', 'mysql+pymysql://root:@localhost/share_portfolio')
-        parts = db_url.split('/')
-        db_name = parts[-1]
-        base_url = '/'.join(parts[:-1])
-        
         # Create connection without database name
         connection = pymysql.connect(
-            host='localhost',
-            user='root',
-            password='',
+            host=url.host or 'localhost',
+            port=url.port or 3306,
+            user=url.username or 'root',
+            password=url.password or '',
             charset='utf8mb4'
         )
-        
+
         try:
             with connection.cursor() as cursor:
                 # Create database if it doesn't exist
-                cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
-                print(f"Database {db_name} created successfully!")
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS {url.database}")
+                print(f"Database {url.database} created successfully!")
         finally:
             connection.close()
     except Exception as e:
         print(f"Error creating database: {e}")
 
-# Create database before setting up SQLAlchemy
-create_database()
-
-# Now set up SQLAlchemy with the full database URL using PyMySQL
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'mysql+pymysql://root:@localhost/share_portfolio')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Mail configuration
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-
-# Initialize extensions with app
-db.init_app(app)
-mail.init_app(app)
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-
-# Import models
-from models import User, TradingAccount, Share, SharePrice, VerificationToken
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
-@app.route('/remove_account/<int:account_id>', methods=['POST'])
-@login_required
-def remove_account(account_id):
-    account = TradingAccount.query.filter_by(id=account_id, user_id=current_user.id).first_or_404()
-    
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database (MySQL) and all tables"""
+    import models  # noqa: F401  registers the tables
+    create_database(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    db.create_all()
+    print("Database tables created")
+
+@click.command('rollup-prices')
+@with_appcontext
+def rollup_prices_command():
+    """Roll old price ticks up into minute and daily OHLC bars"""
+    from price_store import rollup_ticks
+    ticks, minute_bars = rollup_ticks()
+    print(f"Rolled up {ticks} ticks and {minute_bars} minute bars")
+
+@click.command('import-bars')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--interval', type=click.Choice(['1d', '1m']), default='1d')
+@click.option('--symbol', help='Symbol for a single file (default: file name)')
+@with_appcontext
+def import_bars_command(paths, interval, symbol):
+    """Backfill the bar store from CSV files or directories of them"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith('.csv'))
+        else:
+            files.append(path)
+    for path in files:
+        try:
+            imported, skipped = bar_store.import_csv(path, symbol=symbol, interval=interval)
+            print(f"{path}: {imported} bars imported, {skipped} rows skipped")
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}")
+
+@click.command('export-ticks')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--since', type=click.DateTime(), help='Only ticks stored after this time (UTC)')
+@with_appcontext
+def export_ticks_command(path, since):
+    """Write stored ticks as a timestamp,symbol,price CSV for the replay source"""
+    from models import SharePrice
+
+    query = db.session.query(SharePrice.last_updated, SharePrice.share_name, SharePrice.current_price)\
+        .order_by(SharePrice.last_updated, SharePrice.id)
+    if since:
+        query = query.filter(SharePrice.last_updated >= since)
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp', 'symbol', 'price'])
+        for last_updated, share_name, current_price in query.yield_per(10000):
+            writer.writerow([last_updated.isoformat(), share_name, current_price])
+            count += 1
+    print(f"Exported {count} ticks to {path}")
+
+@click.command('check-aggregates')
+@click.option('--fix', is_flag=True, help='Rebuild the aggregates of users that differ')
+@with_appcontext
+def check_aggregates_command(fix):
+    """Compare stored portfolio aggregates with a rebuild from holdings"""
+    import aggregates
+
+    mismatches = aggregates.check_aggregates(fix=fix)
+    for kind, key, stored, computed in mismatches:
+        print(f"{kind} {key}: stored={stored} computed={computed}")
+    print(f"{len(mismatches)} mismatches" + (" fixed" if fix and mismatches else ""))
+
+@click.command('purge-tokens')
+@with_appcontext
+def purge_tokens_command():
+    """Delete expired and used OTPs and verification tokens"""
+    print(f"Purged {token_store.purge()} tokens")
+
+@click.command('import-holdings')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--account-id', type=int, required=True, help='Trading account to add the holdings to')
+@click.option('--allow-unknown', is_flag=True, help='Accept symbols the quote store has never seen')
+@click.option('--no-prewarm', is_flag=True, help="Don't fetch prices for the imported symbols")
+@with_appcontext
+def import_holdings_command(path, account_id, allow_unknown, no_prewarm):
+    """Bulk-import holdings from a broker CSV or contract note export"""
+    from models import TradingAccount
+    from holdings_import import import_holdings, prewarm_prices, HoldingsImportError
+
+    account = db.session.get(TradingAccount, account_id)
+    if account is None:
+        raise click.ClickException(f"No trading account {account_id}")
     try:
-        # Delete associated shares first (due to foreign key constraints)
-        Share.query.filter_by(account_id=account_id).delete()
-        
-        # Delete the account
-        db.session.delete(account)
-        db.session.commit()
-        
-        flash('Trading account removed successfully', 'success')
-    except Exception as e:
-        db.session.rollback()
-        flash('Error removing trading account. Please try again.', 'danger')
-        app.logger.error(f"Error removing account {account_id}: {str(e)}")
-    
-    return redirect(url_for('dashboard'))
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            result = import_holdings(f, account, allow_unknown=allow_unknown)
+    except HoldingsImportError as e:
+        raise click.ClickException(f"{path}: {e}")
+    for line, message in result['errors']:
+        print(f"line {line}: {message}")
+    if result['errors_truncated']:
+        print(f"... and {result['skipped'] - len(result['errors'])} more skipped rows")
+    print(f"Imported {result['imported']} holdings ({len(result['symbols'])} symbols), skipped {result['skipped']} rows")
+    if not no_prewarm and result['symbols']:
+        prices = prewarm_prices(result['symbols'])
+        print(f"Fetched prices for {sum(1 for price in prices.values() if price)} of {len(prices)} symbols")
 
 if __name__ == '__main__':
-    # Import routes after all models and extensions are initialized
-    from routes import *
-    
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True)
+    create_app().run(debug=True)
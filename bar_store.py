@@ -0,0 +1,282 @@
+"""Columnar OHLCV bar files, read through memory maps.
+
+Bars live under ``<root>/<interval>/<symbol>/`` with one raw
+little-endian file per column, rows sorted by bar start (epoch seconds):
+
+    ts.bin  open.bin  high.bin  low.bin  close.bin  volume.bin
+
+Range reads binary-search the ``ts`` column and hand back views of the
+mapped files, so nothing is copied until the caller touches the data.
+Writers append in place; the backfill importer merges and rewrites.
+"""
+import csv
+import logging
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads in this process are serialised
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# NumPy dtypes; numpy itself is only imported for range reads and
+# rewrites, so the tick path and app startup don't pay for it
+COLUMNS = (
+    ('ts', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+)
+COLUMN_WIDTH = 8  # bytes per value in every column
+STRUCT_FORMATS = {'<i8': '<q', '<f8': '<d'}
+INTERVALS = {'1m': 60, '1d': 86400}
+EPOCH = datetime(1970, 1, 1)
+
+# CSV header names accepted by the importer (compared lower-cased)
+CSV_FIELDS = {
+    'ts': ('date', 'datetime', 'timestamp', 'time'),
+    'open': ('open',),
+    'high': ('high',),
+    'low': ('low',),
+    'close': ('close', 'adj close', 'ltp'),
+    'volume': ('volume', 'vol', 'shares traded'),
+}
+CSV_DATE_FORMATS = ('%d-%b-%Y', '%d-%m-%Y', '%d/%m/%Y', '%Y/%m/%d')
+
+def naive_utc(value):
+    """Convert an offset-aware datetime to naive UTC; naive ones are taken as UTC already"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def to_epoch(value):
+    """Epoch seconds for a UTC datetime (ints pass through)"""
+    if isinstance(value, datetime):
+        return int((naive_utc(value) - EPOCH).total_seconds())
+    return int(value)
+
+def parse_date(text):
+    text = text.strip()
+    try:
+        return naive_utc(datetime.fromisoformat(text))
+    except ValueError:
+        pass
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+    return None
+
+class BarStore:
+    """Per-symbol daily and intraday bars in memory-mapped column files"""
+
+    def __init__(self, app=None):
+        self.root = None
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # An empty BAR_STORE_PATH turns the store off
+        self.root = app.config.get('BAR_STORE_PATH') or None
+        app.extensions['bar_store'] = self
+
+    @property
+    def enabled(self):
+        return self.root is not None
+
+    def _directory(self, symbol, interval):
+        if interval not in INTERVALS:
+            raise ValueError(f"Unknown bar interval {interval!r}")
+        return os.path.join(self.root, interval, quote(symbol, safe=''))
+
+    # --- Reading ---------------------------------------------------------
+
+    @staticmethod
+    def _rows(directory):
+        """Complete rows on disk; a torn append leaves some columns longer"""
+        sizes = []
+        for name, _ in COLUMNS:
+            path = os.path.join(directory, f'{name}.bin')
+            sizes.append(os.path.getsize(path) // COLUMN_WIDTH if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def read(self, symbol, interval='1d', start=None, end=None):
+        """Bars with ``start <= ts < end`` as {column: array}.
+
+        The arrays are read-only views of the mapped files. ``start`` and
+        ``end`` are naive UTC datetimes or epoch seconds.
+        """
+        import numpy as np
+
+        directory = self._directory(symbol, interval)
+        rows = self._rows(directory) if os.path.isdir(directory) else 0
+        if not rows:
+            return {name: np.empty(0, dtype) for name, dtype in COLUMNS}
+
+        columns = {
+            name: np.memmap(os.path.join(directory, f'{name}.bin'), dtype=dtype, mode='r', shape=(rows,))
+            for name, dtype in COLUMNS
+        }
+        ts = columns['ts']
+        lo = np.searchsorted(ts, to_epoch(start), 'left') if start is not None else 0
+        hi = np.searchsorted(ts, to_epoch(end), 'left') if end is not None else rows
+        return {name: column[lo:hi] for name, column in columns.items()}
+
+    # --- Writing ---------------------------------------------------------
+
+    def _lock(self, directory):
+        with self._locks_lock:
+            return self._locks.setdefault(directory, threading.Lock())
+
+    @contextmanager
+    def _locked(self, directory):
+        """Hold the thread lock and, where available, a file lock on a symbol's files"""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock(directory), open(os.path.join(directory, '.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    @staticmethod
+    def _truncate(directory, rows):
+        for name, _ in COLUMNS:
+            path = os.path.join(directory, f'{name}.bin')
+            if os.path.exists(path) and os.path.getsize(path) != rows * COLUMN_WIDTH:
+                os.truncate(path, rows * COLUMN_WIDTH)
+
+    def _apply_tick(self, directory, bucket, price):
+        rows = self._rows(directory)
+        self._truncate(directory, rows)
+        if rows:
+            with open(os.path.join(directory, 'ts.bin'), 'rb') as f:
+                f.seek((rows - 1) * COLUMN_WIDTH)
+                last = struct.unpack('<q', f.read(COLUMN_WIDTH))[0]
+            if last > bucket:
+                return False  # older than the bar already being built
+            if last == bucket:
+                self._update_last(directory, rows - 1, price)
+                return True
+        row = (bucket, price, price, price, price, 0.0)
+        for (name, dtype), value in zip(COLUMNS, row):
+            with open(os.path.join(directory, f'{name}.bin'), 'ab') as f:
+                f.write(struct.pack(STRUCT_FORMATS[dtype], value))
+        return True
+
+    @staticmethod
+    def _update_last(directory, index, price):
+        for name, combine in (('high', max), ('low', min), ('close', None)):
+            with open(os.path.join(directory, f'{name}.bin'), 'r+b') as f:
+                f.seek(index * COLUMN_WIDTH)
+                current = struct.unpack('<d', f.read(COLUMN_WIDTH))[0]
+                f.seek(index * COLUMN_WIDTH)
+                f.write(struct.pack('<d', combine(current, price) if combine else price))
+
+    def append_ticks(self, prices, timestamp):
+        """Fold a batch of {symbol: price} quotes into the current 1m and 1d bars.
+
+        Ticks older than a symbol's latest bar are ignored; the store is
+        append-only apart from updating that latest bar.
+        """
+        if not self.enabled:
+            return
+        epoch = to_epoch(timestamp)
+        for symbol, price in prices.items():
+            if not price:
+                continue
+            try:
+                # Finest interval first: a tick too old for the minute bars
+                # must not move the daily close either
+                for interval, seconds in INTERVALS.items():
+                    directory = self._directory(symbol, interval)
+                    with self._locked(directory):
+                        if not self._apply_tick(directory, epoch - epoch % seconds, float(price)):
+                            break
+            except Exception as e:
+                logger.error(f"Error appending {symbol} to bar store: {e}")
+
+    def write_bars(self, symbol, interval, bars):
+        """Merge {column: array} bars into the stored series and rewrite it.
+
+        Incoming bars replace stored bars with the same start time. Returns
+        the number of stored rows afterwards.
+        """
+        import numpy as np
+
+        directory = self._directory(symbol, interval)
+        with self._locked(directory):
+            existing = self.read(symbol, interval)
+            merged = {
+                name: np.concatenate([np.asarray(existing[name]), np.asarray(bars[name], dtype=dtype)])
+                for name, dtype in COLUMNS
+            }
+            order = np.argsort(merged['ts'], kind='stable')
+            ts = merged['ts'][order]
+            # Keep the last of each run of equal timestamps (the incoming bar)
+            keep = order[np.append(ts[1:] != ts[:-1], True)]
+            del existing
+            for name, dtype in COLUMNS:
+                path = os.path.join(directory, f'{name}.bin')
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(merged[name][keep].astype(dtype).tobytes())
+                os.replace(path + '.tmp', path)
+            return len(keep)
+
+    # --- Backfill --------------------------------------------------------
+
+    def import_csv(self, path, symbol=None, interval='1d'):
+        """Backfill bars from a CSV file with Date/Open/High/Low/Close[/Volume] columns.
+
+        The symbol defaults to the file name without its extension. Returns
+        (imported, skipped) row counts.
+        """
+        from quote_parser import clean_number
+
+        symbol = symbol or os.path.splitext(os.path.basename(path))[0]
+        seconds = INTERVALS[interval]
+        values = {name: [] for name, _ in COLUMNS}
+        skipped = 0
+
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = [name.strip().lower() for name in next(reader, [])]
+            positions = {}
+            for field, aliases in CSV_FIELDS.items():
+                for alias in aliases:
+                    if alias in header:
+                        positions[field] = header.index(alias)
+                        break
+            missing = {'ts', 'close'} - set(positions)
+            if missing:
+                raise ValueError(f"{path}: no {', '.join(sorted(missing))} column")
+
+            for row in reader:
+                if len(row) <= max(positions.values()):
+                    skipped += 1  # short or blank row
+                    continue
+                when = parse_date(row[positions['ts']])
+                close = clean_number(row[positions['close']])
+                if when is None or not close:
+                    skipped += 1
+                    continue
+                epoch = to_epoch(when)
+                values['ts'].append(epoch - epoch % seconds)
+                values['close'].append(close)
+                for field in ('open', 'high', 'low'):
+                    value = clean_number(row[positions[field]]) if field in positions else 0
+                    values[field].append(value or close)
+                values['volume'].append(clean_number(row[positions['volume']]) if 'volume' in positions else 0)
+
+        if values['ts']:
+            self.write_bars(symbol, interval, values)
+        return len(values['ts']), skipped
@@ -0,0 +1,117 @@
+"""Time the alert threshold index against scanning every rule on each quote.
+
+Loads random price-cross and percentage-move rules into an AlertIndex,
+replays random quote batches through it and through a full scan, checks
+both fire the same rules, and reports per-quote cost:
+
+    python benchmarks/bench_alerts.py [--rules 100000] [--symbols 2000] [--quotes 20000] [--json out.json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alerts import AlertIndex, thresholds
+
+def synthetic_rules(count, symbols, seed=11):
+    rng = random.Random(seed)
+    prices = {f'SYM{i}': rng.uniform(50, 5000) for i in range(symbols)}
+    names = list(prices)
+    rules = []
+    for rule_id in range(1, count + 1):
+        symbol = rng.choice(names)
+        reference = prices[symbol]
+        if rng.random() < 0.7:
+            above, below = thresholds('cross', reference * rng.uniform(0.7, 1.3), reference)
+        else:
+            above, below = thresholds('move', rng.uniform(1, 20), reference)
+        rules.append((rule_id, symbol, above, below))
+    return prices, rules
+
+def synthetic_quotes(prices, count, seed=13):
+    rng = random.Random(seed)
+    names = list(prices)
+    quotes = []
+    for _ in range(count):
+        symbol = rng.choice(names)
+        # Small random walk, so most quotes cross nothing
+        prices[symbol] *= 1 + rng.gauss(0, 0.01)
+        quotes.append((symbol, prices[symbol]))
+    return quotes
+
+def scan(rules, quotes):
+    """Check every active rule on every quote"""
+    active = dict((rule_id, (symbol, above, below)) for rule_id, symbol, above, below in rules)
+    fired = []
+    for symbol, price in quotes:
+        crossed = [
+            rule_id for rule_id, (rule_symbol, above, below) in active.items()
+            if rule_symbol == symbol and ((above is not None and price >= above) or
+                                          (below is not None and price <= below))
+        ]
+        for rule_id in crossed:
+            del active[rule_id]
+        fired.append(sorted(crossed))
+    return fired
+
+def indexed(index, quotes):
+    return [sorted(index.match(symbol, price)) for symbol, price in quotes]
+
+def build(rules):
+    index = AlertIndex()
+    for rule_id, symbol, above, below in rules:
+        index.add(rule_id, symbol, above, below)
+    return index
+
+def run(rule_count, symbols, quote_count, scan_quotes):
+    prices, rules = synthetic_rules(rule_count, symbols)
+    quotes = synthetic_quotes(prices, quote_count)
+
+    started = time.perf_counter()
+    index = build(rules)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    fired = indexed(index, quotes)
+    index_seconds = time.perf_counter() - started
+
+    sample = quotes[:scan_quotes]
+    started = time.perf_counter()
+    expected = scan(rules, sample)
+    scan_seconds = time.perf_counter() - started
+    if fired[:scan_quotes] != expected:
+        raise SystemExit("index and full scan fired different rules")
+
+    return [
+        {'method': 'index', 'rules': rule_count, 'quotes': len(quotes),
+         'fired': sum(len(ids) for ids in fired), 'build_ms': build_seconds * 1000,
+         'us_per_quote': index_seconds / len(quotes) * 1e6},
+        {'method': 'scan', 'rules': rule_count, 'quotes': len(sample),
+         'fired': sum(len(ids) for ids in expected), 'build_ms': 0,
+         'us_per_quote': scan_seconds / len(sample) * 1e6},
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rules', type=int, default=100000)
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--quotes', type=int, default=20000)
+    parser.add_argument('--scan-quotes', type=int, default=200, help='Quotes replayed through the slow full scan')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.rules, args.symbols, args.quotes, args.scan_quotes)
+    print(f"{'method':<8}{'quotes':>8}{'fired':>8}{'build ms':>10}{'us/quote':>12}")
+    for r in results:
+        print(f"{r['method']:<8}{r['quotes']:>8}{r['fired']:>8}{r['build_ms']:>10.1f}{r['us_per_quote']:>12.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
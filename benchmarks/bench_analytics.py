@@ -0,0 +1,180 @@
+"""Compare the NumPy analytics with a per-row Python implementation.
+
+Builds a synthetic portfolio (random holdings and random-walk daily
+closes), checks both implementations agree, then times each metric:
+
+    python benchmarks/bench_analytics.py [--holdings 2000] [--symbols 500] [--days 1260] [--json out.json]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+
+def synthetic(holdings, symbols, days, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64('2020-01-01') + np.arange(days)
+    closes = 100 * np.cumprod(1 + rng.normal(0.0004, 0.02, (days, symbols + 1)), axis=0)
+    # Some symbols only start trading part-way through
+    for column in rng.choice(symbols, symbols // 10, replace=False):
+        closes[:rng.integers(1, days), column] = np.nan
+    column = rng.integers(0, symbols, holdings)
+    return {
+        'dates': dates,
+        'closes': closes[:, :-1],
+        'benchmark': closes[:, -1],
+        'column': column,
+        'account': rng.integers(0, 20, holdings),
+        'quantity': rng.integers(1, 500, holdings).astype(float),
+        'buying_price': rng.uniform(50, 150, holdings),
+        'bought_at': dates[rng.integers(0, days - 1, holdings)],
+        'price': rng.uniform(50, 200, holdings)
+    }
+
+# --- Per-row reference -------------------------------------------------------
+
+def naive_returns(series):
+    return [b / a - 1 if a == a and b == b else float('nan') for a, b in zip(series, series[1:])]
+
+def naive_volatility(returns):
+    values = [r for r in returns if r == r]
+    if len(values) < 2:
+        return float('nan')
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((r - mean) ** 2 for r in values) / (len(values) - 1)) * math.sqrt(analytics.TRADING_DAYS)
+
+def naive_drawdown(series):
+    peak, worst = None, float('nan')
+    for price in series:
+        if price != price:
+            continue
+        peak = price if peak is None else max(peak, price)
+        drop = 1 - price / peak
+        worst = drop if worst != worst else max(worst, drop)
+    return worst
+
+def naive_beta(returns, benchmark):
+    pairs = [(r, b) for r, b in zip(returns, benchmark) if r == r and b == b]
+    if len(pairs) < 2:
+        return float('nan')
+    mean_r = sum(r for r, _ in pairs) / len(pairs)
+    mean_b = sum(b for _, b in pairs) / len(pairs)
+    covariance = sum((r - mean_r) * (b - mean_b) for r, b in pairs)
+    variance = sum((b - mean_b) ** 2 for _, b in pairs)
+    return covariance / variance if variance else float('nan')
+
+def naive_xirr(flows):
+    start = min(day for day, _ in flows)
+    years = [((day - start).astype(int) / 365.0, amount) for day, amount in flows]
+    rate = 0.1
+    for _ in range(analytics.XIRR_MAX_ITERATIONS):
+        value = sum(amount * (1 + rate) ** -t for t, amount in years)
+        slope = sum(-t * amount * (1 + rate) ** (-t - 1) for t, amount in years)
+        if slope == 0:
+            return float('nan')
+        step = value / slope
+        rate = max(rate - step, -0.9999)
+        if abs(step) < analytics.XIRR_TOLERANCE:
+            return rate
+    return float('nan')
+
+def naive(data, as_of):
+    closes = data['closes'].tolist()
+    columns = list(zip(*closes))
+    filled = []
+    for series in columns:
+        last, out = float('nan'), []
+        for price in series:
+            last = price if price == price else last
+            out.append(last)
+        filled.append(out)
+    benchmark_returns = naive_returns(data['benchmark'].tolist())
+    per_symbol = []
+    for series in filled:
+        returns = naive_returns(series)
+        per_symbol.append((naive_volatility(returns), naive_drawdown(series), naive_beta(returns, benchmark_returns)))
+
+    accounts = {}
+    for account, quantity, buy, bought, price in zip(data['account'], data['quantity'], data['buying_price'],
+                                                      data['bought_at'], data['price']):
+        accounts.setdefault(account, []).extend([(bought, -quantity * buy), (as_of, quantity * price)])
+    return per_symbol, {account: naive_xirr(flows) for account, flows in accounts.items()}
+
+def vectorized(data, as_of):
+    closes = analytics._ffill(data['closes'])
+    returns = analytics.daily_returns(closes)
+    benchmark_returns = analytics.daily_returns(data['benchmark'])
+    per_symbol = list(zip(analytics.volatility(returns), analytics.max_drawdown(closes),
+                          analytics.beta(returns, benchmark_returns)))
+
+    accounts, index = np.unique(data['account'], return_inverse=True)
+    values = data['quantity'] * data['price']
+    amounts = np.concatenate([-data['quantity'] * data['buying_price'], values])
+    dates = np.concatenate([data['bought_at'], np.full(len(values), as_of)])
+    rates = analytics.xirr(amounts, dates, np.tile(index, 2), len(accounts))
+    analytics.portfolio_series(data['dates'], closes, data['column'], data['quantity'],
+                               data['bought_at'], data['buying_price'])
+    return per_symbol, dict(zip(accounts.tolist(), rates.tolist()))
+
+def _close(a, b):
+    return (a != a and b != b) or math.isclose(a, b, rel_tol=1e-6, abs_tol=1e-9)
+
+def run(holdings, symbols, days, iterations):
+    data = synthetic(holdings, symbols, days)
+    as_of = data['dates'][-1]
+
+    expected_symbols, expected_xirr = naive(data, as_of)
+    got_symbols, got_xirr = vectorized(data, as_of)
+    for expected, got in zip(expected_symbols, got_symbols):
+        if not all(_close(a, float(b)) for a, b in zip(expected, got)):
+            raise SystemExit(f"symbol metrics differ: {expected} != {got}")
+    for account, rate in expected_xirr.items():
+        if not _close(rate, got_xirr[account]):
+            raise SystemExit(f"account {account} XIRR differs: {rate} != {got_xirr[account]}")
+
+    results = []
+    for name, implementation in (('naive', naive), ('numpy', vectorized)):
+        timings = []
+        for _ in range(iterations if name == 'numpy' else max(1, iterations // 10)):
+            started = time.perf_counter()
+            implementation(data, as_of)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        results.append({
+            'implementation': name,
+            'holdings': holdings,
+            'symbols': symbols,
+            'days': days,
+            'runs': len(timings),
+            'median_ms': timings[len(timings) // 2] * 1000,
+            'min_ms': timings[0] * 1000
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--holdings', type=int, default=2000)
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--days', type=int, default=1260)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.holdings, args.symbols, args.days, args.iterations)
+    print(f"{'implementation':<16}{'median ms':>12}{'min ms':>10}")
+    for r in results:
+        print(f"{r['implementation']:<16}{r['median_ms']:>12.2f}{r['min_ms']:>10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
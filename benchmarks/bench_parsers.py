@@ -0,0 +1,71 @@
+"""Compare the quote_parser backends on saved Google Finance pages.
+
+Checks that every backend extracts the same data as the BeautifulSoup
+reference path, then times each one:
+
+    python benchmarks/bench_parsers.py [--iterations 20] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quote_parser
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+CASES = [
+    ('price', 'quote_RELIANCE_NSE.html', lambda html, backend: quote_parser.parse_price(html, backend)),
+    ('constituents', 'index_NSEI.html', lambda html, backend: quote_parser.parse_constituents(html, 50, backend)),
+]
+
+def available_backends():
+    return [b for b in quote_parser.BACKENDS if b != 'lxml' or quote_parser.lxml is not None]
+
+def run(iterations):
+    results = []
+    for name, fixture, parse in CASES:
+        with open(os.path.join(FIXTURES, fixture), encoding='utf-8') as f:
+            html = f.read()
+        expected = parse(html, 'soup')
+        if not expected:
+            raise SystemExit(f"{fixture}: reference parser found nothing")
+
+        for backend in available_backends():
+            if parse(html, backend) != expected:
+                raise SystemExit(f"{fixture}: {backend} output differs from BeautifulSoup")
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                parse(html, backend)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            results.append({
+                'case': name,
+                'backend': backend,
+                'iterations': iterations,
+                'median_ms': timings[len(timings) // 2] * 1000,
+                'min_ms': timings[0] * 1000
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+    print(f"{'case':<14}{'backend':<10}{'median ms':>12}{'min ms':>10}")
+    for r in results:
+        print(f"{r['case']:<14}{r['backend']:<10}{r['median_ms']:>12.2f}{r['min_ms']:>10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
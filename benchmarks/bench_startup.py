@@ -0,0 +1,89 @@
+"""Time a cold worker boot: importing the app, create_app() and the first request.
+
+Every run is a fresh interpreter, as a new gunicorn worker would be. Socket
+connects are intercepted in the child, so the report also shows whether
+booting touched the network (it should not: the database is only
+connected on the first query and scraping starts on demand):
+
+    python benchmarks/bench_startup.py [--runs 10] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only load once a view needs them
+HEAVY_MODULES = ('numpy', 'bs4', 'lxml', 'share_scraper', 'analytics')
+
+CHILD = r'''
+import json, socket, sys, time
+connects = []
+original_connect = socket.socket.connect
+def connect(self, address):
+    connects.append(repr(address))
+    return original_connect(self, address)
+socket.socket.connect = connect
+
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+status = app.test_client().get('/login').status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - started) * 1000,
+    'status': status,
+    'heavy_modules': heavy,
+    'connects': connects,
+}))
+'''
+
+def boot_once(env):
+    code = f'HEAVY_MODULES = {HEAVY_MODULES!r}\n' + CHILD
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise SystemExit(f"app failed to boot:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run(runs):
+    env = dict(os.environ)
+    env.setdefault('PRICE_WORKER_ENABLED', 'False')
+    samples = [boot_once(env) for _ in range(runs)]
+    summary = {}
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+        values = sorted(sample[key] for sample in samples)
+        summary[key] = {'median': statistics.median(values), 'max': values[-1]}
+    summary['network_connects'] = sum(len(sample['connects']) for sample in samples)
+    summary['heavy_modules'] = sorted({name for sample in samples for name in sample['heavy_modules']})
+    summary['statuses'] = sorted({sample['status'] for sample in samples})
+    return summary, samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    summary, samples = run(args.runs)
+    print(f"{'phase':<18}{'median ms':>12}{'max ms':>10}")
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+        print(f"{key[:-3]:<18}{summary[key]['median']:>12.1f}{summary[key]['max']:>10.1f}")
+    print(f"network connects during boot: {summary['network_connects']}")
+    print(f"heavy modules loaded at boot: {', '.join(summary['heavy_modules']) or 'none'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'summary': summary, 'runs': samples}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
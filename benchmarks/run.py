@@ -0,0 +1,339 @@
+"""Offline end-to-end benchmark of the web app, scrapers and parsers.
+
+Runs against a throwaway SQLite database and a local stub server that
+serves the saved Google Finance pages in benchmarks/fixtures, with
+synthetic users, accounts and holdings. Reports p50/p95/p99 latency and
+throughput per scenario and writes everything to JSON:
+
+    python benchmarks/run.py [--users 20] [--accounts 3] [--holdings 10] [--requests 200]
+                             [--concurrency 4] [--latency-ms 0] [--json out.json]
+                             [--compare previous.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+PASSWORD = 'benchmark-password'
+
+# --- Stub Google Finance -----------------------------------------------------
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+class StubFinanceHandler(BaseHTTPRequestHandler):
+    """Serves the index page for index and market list URLs, the quote page otherwise"""
+
+    pages = {}
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        path = self.path.split('?')[0]
+        if path.startswith('/quote/.') or path.startswith('/markets/'):
+            body = self.pages['index']
+        elif path.startswith('/quote/'):
+            body = self.pages['quote']
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub_server(latency_ms):
+    StubFinanceHandler.pages = {
+        'quote': _fixture('quote_RELIANCE_NSE.html'),
+        'index': _fixture('index_NSEI.html'),
+    }
+    StubFinanceHandler.latency = latency_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubFinanceHandler)
+    threading.Thread(target=server.serve_forever, name='stub-finance', daemon=True).start()
+    return server
+
+# --- Environment -------------------------------------------------------------
+
+def configure_environment(workdir, stub_url):
+    """Point the app at SQLite and the stub server; must run before importing it"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['GOOGLE_FINANCE_URL'] = stub_url
+    os.environ['BAR_STORE_PATH'] = os.path.join(workdir, 'bars')
+    os.environ['SCRAPE_RATE_PER_HOST'] = '100000'
+    os.environ['SCRAPE_BURST'] = '100000'
+    os.environ.setdefault('PRICE_WORKER_ENABLED', 'False')
+
+def load_app():
+    from app import create_app
+    # Never talk to a real SMTP server
+    return create_app({'MAIL_SUPPRESS_SEND': True})
+
+def create_users(app, users, accounts, holdings, symbols):
+    """Synthetic users with ``accounts`` accounts of ``holdings`` random holdings each"""
+    from werkzeug.security import generate_password_hash
+    from models import db, User, TradingAccount, Share
+
+    rng = random.Random(42)
+    password = generate_password_hash(PASSWORD)
+    names = [f'SYM{i}' for i in range(symbols)]
+    with app.app_context():
+        db.create_all()
+        user_ids = []
+        for u in range(users):
+            user = User(username=f'bench{u}', email=f'bench{u}@example.com', password=password, is_verified=True)
+            db.session.add(user)
+            db.session.flush()
+            for a in range(accounts):
+                account = TradingAccount(name=f'Account {a}', user_id=user.id)
+                db.session.add(account)
+                db.session.flush()
+                db.session.add_all(
+                    Share(name=rng.choice(names), quantity=rng.randint(1, 500),
+                          buying_price=round(rng.uniform(50, 3000), 2), account_id=account.id)
+                    for _ in range(holdings)
+                )
+            user_ids.append(user.id)
+        db.session.commit()
+    return user_ids, names
+
+# --- Measurement -------------------------------------------------------------
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+def measure(name, operation, count, concurrency, setup=None):
+    """Run ``operation(state)`` ``count`` times over ``concurrency`` threads.
+
+    ``setup()`` builds per-thread state (e.g. a logged-in test client).
+    ``operation`` returns False (or raises) to count an error; the first
+    exception is kept in the result so failing scenarios can be diagnosed.
+    """
+    latencies = []
+    errors = [0]
+    first_error = []
+    lock = threading.Lock()
+    per_thread = [count // concurrency + (1 if i < count % concurrency else 0) for i in range(concurrency)]
+
+    def worker(runs):
+        state = setup() if setup else None
+        local = []
+        failed = 0
+        for _ in range(runs):
+            started = time.perf_counter()
+            try:
+                ok = operation(state)
+            except Exception as e:
+                ok = False
+                with lock:
+                    if not first_error:
+                        first_error.append(f"{type(e).__name__}: {e}")
+            local.append(time.perf_counter() - started)
+            if ok is False:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, per_thread))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'name': name,
+        'count': len(latencies),
+        'concurrency': concurrency,
+        'errors': errors[0],
+        'first_error': first_error[0] if first_error else None,
+        'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0,
+        'throughput_rps': len(latencies) / wall if wall else 0,
+    }
+
+def web_scenarios(app, user_ids, args):
+    rng = random.Random(7)
+
+    def client_for(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            # What Flask-Login stores after a completed OTP login
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+
+    def get(path):
+        def operation(client):
+            status = client.get(path).status_code
+            if status != 200:
+                raise AssertionError(f"GET {path} returned {status}")
+        return operation
+
+    def login(client):
+        user = rng.randrange(len(user_ids))
+        response = client.post('/login', data={'username': f'bench{user}', 'password': PASSWORD})
+        return response.status_code == 302 and '/verify-otp' in response.headers.get('Location', '')
+
+    results = []
+    # Let the home page snapshot fill once so '/' measures the cached path
+    app.extensions['market_snapshot'].refresh()
+    results.append(measure('GET /', get('/'), args.requests, args.concurrency, app.test_client))
+    results.append(measure('GET /dashboard', get('/dashboard'), args.requests, args.concurrency,
+                           lambda: client_for(rng.choice(user_ids))))
+    results.append(measure('GET /api/portfolio', get('/api/portfolio'), args.requests, args.concurrency,
+                           lambda: client_for(rng.choice(user_ids))))
+    results.append(measure('POST /login', login, args.requests, args.concurrency, app.test_client))
+    return results
+
+def scraper_scenarios(app, symbols, args):
+    import share_scraper
+
+    rng = random.Random(11)
+
+    def in_context(function):
+        def operation(_):
+            with app.app_context():
+                return function()
+        return operation
+
+    def fetch_one():
+        price, _ = share_scraper._fetch_share_price(rng.choice(symbols), 'NSE')
+        return price is not None
+
+    def fetch_batch():
+        batch = rng.sample(symbols, min(20, len(symbols)))
+        for symbol in batch:
+            share_scraper.quote_cache.invalidate(symbol)
+        return bool(share_scraper.get_share_prices(batch))
+
+    count = max(10, args.requests // 4)
+    return [
+        measure('scrape quote page', in_context(fetch_one), count, args.concurrency),
+        measure('get_share_prices (20 symbols)', in_context(fetch_batch), count, args.concurrency),
+        measure('get_nifty50_shares', in_context(lambda: bool(share_scraper.get_nifty50_shares())),
+                count, args.concurrency),
+        measure('get_top_gainers_losers', in_context(lambda: bool(share_scraper.get_top_gainers_losers()[0])),
+                count, args.concurrency),
+    ]
+
+# --- Reporting ---------------------------------------------------------------
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def print_results(results, previous=None):
+    baseline = {r['name']: r for r in (previous or {}).get('results', [])}
+    print(f"{'scenario':<32}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+          + ('  p95 vs base' if baseline else ''))
+    for r in results:
+        line = (f"{r['name']:<32}{r['count']:>6}{r['errors']:>5}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+                f"{r['p99_ms']:>10.2f}{r['throughput_rps']:>10.1f}")
+        base = baseline.get(r['name'])
+        if base and base['p95_ms']:
+            line += f"  {(r['p95_ms'] / base['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--accounts', type=int, default=3, help='Accounts per user')
+    parser.add_argument('--holdings', type=int, default=10, help='Holdings per account')
+    parser.add_argument('--symbols', type=int, default=100, help='Distinct symbols held across all users')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per web scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Simulated network latency of the stub server')
+    parser.add_argument('--parser-iterations', type=int, default=20)
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--compare', help='Previous JSON results to compare p95 latencies with')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary database and bar store')
+    parser.add_argument('--allow-errors', action='store_true',
+                        help='Write the JSON results even if some requests failed')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='share-bench-')
+    server = start_stub_server(args.latency_ms)
+    try:
+        configure_environment(workdir, f'http://127.0.0.1:{server.server_address[1]}')
+        app = load_app()
+        user_ids, symbols = create_users(app, args.users, args.accounts, args.holdings, args.symbols)
+
+        results = web_scenarios(app, user_ids, args)
+        results += scraper_scenarios(app, symbols, args)
+
+        import bench_parsers
+        parsers = bench_parsers.run(args.parser_iterations)
+    finally:
+        server.shutdown()
+        if args.keep:
+            print(f"Kept benchmark data in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'settings': vars(args),
+        },
+        'results': results,
+        'parsers': parsers,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+    print()
+    print(f"{'parser case':<14}{'backend':<10}{'median ms':>12}")
+    for r in parsers:
+        print(f"{r['case']:<14}{r['backend']:<10}{r['median_ms']:>12.2f}")
+
+    # Latencies of failing requests aren't a baseline; don't let them pass as one
+    failed = [r for r in results if r['errors']]
+    for r in failed:
+        print(f"ERROR: {r['name']}: {r['errors']} of {r['count']} requests failed"
+              + (f" ({r['first_error']})" if r['first_error'] else ''), file=sys.stderr)
+
+    if args.json and (not failed or args.allow_errors):
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    elif args.json:
+        print(f"Not writing {args.json} because some scenarios failed (use --allow-errors)", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,14 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_mail import Mail
 import pymysql
+from market_snapshot import MarketSnapshot
+from mail_outbox import MailOutbox
+from price_stream import PriceBroadcaster
+from bar_store import BarStore
+from tick_buffer import TickBuffer
+from metrics import Metrics
+from token_store import TokenStore
+from user_cache import UserCache
 
 # Use PyMySQL instead of MySQLdb
 pymysql.install_as_MySQLdb()
@@ -9,8 +17,15 @@ pymysql.install_as_MySQLdb()
 db = SQLAlchemy()
 login_manager = LoginManager()
 mail = Mail()
+mail_outbox = MailOutbox()
+price_broadcaster = PriceBroadcaster()
+market_snapshot = MarketSnapshot()
+bar_store = BarStore()
+tick_buffer = TickBuffer()
+metrics = Metrics()
+token_store = TokenStore()
+user_cache = UserCache()
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    return user_cache.load(int(user_id))
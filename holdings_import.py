@@ -0,0 +1,226 @@
+"""Bulk import of holdings from broker CSV exports and contract notes.
+
+The file is read one line at a time, so memory stays flat however long
+it is. Rows become Share inserts in batches of BATCH_SIZE, all within one
+transaction together with the rebuilt portfolio aggregates: an import
+either lands completely or not at all. Bad rows are skipped and reported
+with their line number, keeping at most MAX_ERRORS messages.
+
+Recognised columns (case-insensitive, first match wins):
+
+    symbol    symbol, tradingsymbol, instrument, scrip, stock, share, share_name
+    quantity  quantity, qty, qty., shares
+    price     buying_price, price, avg. cost, avg cost, average price, buy price, rate, trade price
+    side      trade_type, trade type, buy/sell, side   (optional; only buys are imported)
+    date      trade_date, trade date, date, order_execution_time   (optional; becomes created_at)
+
+Header lines before the column row (as in contract notes) are skipped.
+"""
+import csv
+import logging
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert
+from models import Share, LatestQuote, SymbolExchange, db
+from bar_store import parse_date
+import aggregates
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 100
+HEADER_SEARCH_LINES = 50
+
+COLUMN_ALIASES = {
+    'symbol': ('symbol', 'tradingsymbol', 'instrument', 'scrip', 'stock', 'share', 'share_name'),
+    'quantity': ('quantity', 'qty', 'qty.', 'shares'),
+    'price': ('buying_price', 'price', 'avg. cost', 'avg cost', 'average price', 'buy price', 'rate', 'trade price'),
+    'side': ('trade_type', 'trade type', 'buy/sell', 'side'),
+    'date': ('trade_date', 'trade date', 'date', 'order_execution_time'),
+}
+BUY_SIDES = {'buy', 'b', 'bought'}
+SERIES_SUFFIXES = ('-EQ', '-BE', '-BZ')
+
+class HoldingsImportError(ValueError):
+    """The file can't be imported at all (e.g. no recognisable header)"""
+
+def normalize_symbol(text):
+    """'NSE:RELIANCE-EQ' -> 'RELIANCE'"""
+    symbol = text.strip().upper()
+    if ':' in symbol:
+        symbol = symbol.split(':', 1)[1]
+    for suffix in SERIES_SUFFIXES:
+        if symbol.endswith(suffix):
+            return symbol[:-len(suffix)]
+    return symbol
+
+def _find_header(reader):
+    """Skip preamble lines until the column row; returns {field: position}"""
+    for _ in range(HEADER_SEARCH_LINES):
+        row = next(reader, None)
+        if row is None:
+            break
+        header = [name.strip().lower() for name in row]
+        positions = {}
+        for field, aliases in COLUMN_ALIASES.items():
+            for alias in aliases:
+                if alias in header:
+                    positions[field] = header.index(alias)
+                    break
+        if {'symbol', 'quantity', 'price'} <= set(positions):
+            return positions
+    raise HoldingsImportError("no header row with symbol, quantity and price columns")
+
+class _SymbolCheck:
+    """Decides, one batch of new symbols at a time, whether the quote store knows a symbol"""
+
+    def __init__(self, allow_unknown):
+        self.allow_unknown = allow_unknown
+        self.status = {}  # symbol -> 'known', 'unlisted' or 'unseen'
+
+    def resolve(self, symbols):
+        new = [symbol for symbol in set(symbols) if symbol not in self.status]
+        if not new:
+            return
+        quoted = {name for (name,) in db.session.query(LatestQuote.share_name)
+                  .filter(LatestQuote.share_name.in_(new))}
+        exchanges = dict(db.session.query(SymbolExchange.symbol, SymbolExchange.exchange)
+                         .filter(SymbolExchange.symbol.in_(new)))
+        for symbol in new:
+            if symbol in quoted or exchanges.get(symbol):
+                self.status[symbol] = 'known'
+            elif symbol in exchanges:
+                self.status[symbol] = 'unlisted'
+            else:
+                self.status[symbol] = 'unseen'
+
+    def error(self, symbol):
+        status = self.status[symbol]
+        if status == 'unlisted':
+            return f"{symbol} is not quoted on NSE or BSE"
+        if status == 'unseen' and not self.allow_unknown:
+            return f"unknown symbol {symbol}"
+        return None
+
+def _parse_row(row, positions, clean_number):
+    """Share column values for a row, or (None, reason) when it can't be imported"""
+    def field(name):
+        position = positions.get(name)
+        return row[position].strip() if position is not None and position < len(row) else ''
+
+    if 'side' in positions and field('side').lower() not in BUY_SIDES:
+        return None, f"{field('side') or 'blank'} trade skipped (only buys are imported)"
+    symbol = normalize_symbol(field('symbol'))
+    if not symbol:
+        return None, "missing symbol"
+    # clean_number gives 0 for anything unparseable
+    quantity = clean_number(field('quantity'))
+    price = clean_number(field('price'))
+    if quantity <= 0 or quantity != int(quantity):
+        return None, f"invalid quantity {field('quantity')!r}"
+    if price <= 0:
+        return None, f"invalid price {field('price')!r}"
+    created_at = parse_date(field('date')) if field('date') else None
+    return {'name': symbol, 'quantity': int(quantity), 'buying_price': price,
+            'created_at': created_at or datetime.utcnow()}, None
+
+def import_holdings(lines, account, allow_unknown=False, batch_size=BATCH_SIZE, max_errors=MAX_ERRORS):
+    """Import holdings into ``account`` from an iterable of CSV text lines.
+
+    Commits once at the end and rolls everything back on a database
+    error. Returns a summary dict with imported/skipped counts, the
+    distinct imported symbols and up to ``max_errors`` (line, message)
+    errors.
+    """
+    from quote_parser import clean_number
+
+    reader = csv.reader(lines)
+    positions = _find_header(reader)
+    check = _SymbolCheck(allow_unknown)
+    imported = skipped = 0
+    errors = []
+    symbols = set()
+    pending = []  # (line, row values, reason), in file order so errors are reported by line
+
+    def skip(line, message):
+        nonlocal skipped
+        skipped += 1
+        if len(errors) < max_errors:
+            errors.append((line, message))
+
+    def flush():
+        nonlocal imported
+        check.resolve(values['name'] for _, values, reason in pending if not reason)
+        rows = []
+        for line, values, reason in pending:
+            message = reason or check.error(values['name'])
+            if message:
+                skip(line, message)
+            else:
+                rows.append(values)
+                symbols.add(values['name'])
+        if rows:
+            db.session.execute(insert(Share), rows)
+            imported += len(rows)
+        pending.clear()
+
+    try:
+        for row in reader:
+            line = reader.line_num
+            if not any(cell.strip() for cell in row):
+                continue
+            values, reason = _parse_row(row, positions, clean_number)
+            if values is not None:
+                values['account_id'] = account.id
+            pending.append((line, values, reason))
+            if len(pending) >= batch_size:
+                flush()
+        flush()
+
+        if imported:
+            # One rebuild instead of a per-row aggregate update
+            aggregates.rebuild_user(account.user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Imported {imported} holdings into account {account.id}, skipped {skipped} rows")
+    return {
+        'imported': imported,
+        'skipped': skipped,
+        'symbols': sorted(symbols),
+        'errors': errors,
+        'errors_truncated': skipped > len(errors),
+    }
+
+def prewarm_prices(symbols):
+    """Fetch prices for freshly imported symbols in one batched call"""
+    if not symbols:
+        return {}
+    from share_scraper import get_share_prices
+    return get_share_prices(symbols)
+
+def prewarm_prices_in_background(symbols):
+    """Start prewarm_prices() on a daemon thread and return at once.
+
+    Scraping many new symbols runs at the rate-limited client's pace, so
+    web requests hand it off instead of holding a worker until it ends.
+    """
+    if not symbols:
+        return None
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                prewarm_prices(symbols)
+            except Exception as e:
+                logger.error(f"Error pre-warming prices for {len(symbols)} imported symbols: {e}")
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=run, name='holdings-prewarm', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,116 @@
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+}
+
+# Responses worth retrying: throttling and transient upstream errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Blocking token bucket allowing ``rate`` requests/second with bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class HttpClient:
+    """Shared keep-alive HTTP client for scraping.
+
+    Wraps one requests.Session with a sized connection pool, applies
+    connect/read timeouts to every call, retries connection errors and
+    throttling responses with jittered exponential backoff, and rate
+    limits each host with its own token bucket.
+    """
+
+    def __init__(self, headers=None, pool_size=20, connect_timeout=3.05, read_timeout=10,
+                 max_retries=3, backoff_base=0.5, backoff_max=8, rate=5, burst=10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+
+    def _bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            delay = min(self.backoff_max, retry_after)
+        else:
+            # Full jitter: anywhere between 0 and the exponential cap
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        """GET ``url``, returning the final response; raises once retries are exhausted"""
+        kwargs.setdefault('timeout', self.timeout)
+        bucket = self._bucket(urlsplit(url).netloc)
+
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"Request to {url} failed ({e}), retrying")
+                self._backoff(attempt)
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                logger.warning(f"Request to {url} returned {response.status_code}, retrying")
+                retry_after = response.headers.get('Retry-After')
+                self._backoff(attempt, float(retry_after) if retry_after and retry_after.isdigit() else None)
+                continue
+            return response
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+client = HttpClient(
+    connect_timeout=_env_float('HTTP_CONNECT_TIMEOUT', 3.05),
+    read_timeout=_env_float('HTTP_READ_TIMEOUT', 10),
+    max_retries=int(os.getenv('HTTP_MAX_RETRIES', 3)),
+    rate=_env_float('SCRAPE_RATE_PER_HOST', 5),
+    burst=int(os.getenv('SCRAPE_BURST', 10))
+)
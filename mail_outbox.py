@@ -0,0 +1,120 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class MailOutbox:
+    """Background sender for outgoing flask_mail messages.
+
+    Routes enqueue fully rendered messages and return immediately. A single
+    worker thread drains the queue in batches over one SMTP connection,
+    which stays open while mail keeps arriving and is closed after
+    MAIL_OUTBOX_IDLE_TIMEOUT seconds without any. Failed sends are retried
+    with backoff up to MAIL_OUTBOX_MAX_RETRIES times.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.batch_size = 20
+        self.max_retries = 3
+        self.retry_delay = 5
+        self.idle_timeout = 30
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._connection = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('MAIL_OUTBOX_BATCH_SIZE', 20)
+        self.max_retries = app.config.get('MAIL_OUTBOX_MAX_RETRIES', 3)
+        self.retry_delay = app.config.get('MAIL_OUTBOX_RETRY_DELAY', 5)
+        self.idle_timeout = app.config.get('MAIL_OUTBOX_IDLE_TIMEOUT', 30)
+        app.extensions['mail_outbox'] = self
+
+    def send(self, message):
+        """Queue a message for delivery without touching SMTP"""
+        self._ensure_worker()
+        self._queue.put((message, 0))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self, timeout=10):
+        """Wait up to ``timeout`` seconds for queued mail to be delivered"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return not self._queue.unfinished_tasks
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='mail-outbox', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _next_batch(self):
+        try:
+            # Block while the connection is idle, then close it if nothing arrives
+            batch = [self._queue.get(timeout=self.idle_timeout if self._connection else None)]
+        except queue.Empty:
+            self._close()
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            with self.app.app_context():
+                self._deliver(batch)
+
+    def _deliver(self, batch):
+        for index, (message, attempts) in enumerate(batch):
+            try:
+                self._connect().send(message)
+            except Exception as e:
+                self._close()
+                if attempts < self.max_retries:
+                    logger.warning(f"Error sending mail to {message.recipients}, will retry: {e}")
+                    self._queue.put((message, attempts + 1))
+                else:
+                    logger.error(f"Giving up sending mail to {message.recipients}: {e}")
+                for _ in batch[index:]:
+                    self._queue.task_done()
+                # Requeue the rest of the batch untouched and back off
+                for rest in batch[index + 1:]:
+                    self._queue.put(rest)
+                time.sleep(self.retry_delay * (attempts + 1))
+                return
+            self._queue.task_done()
+
+    def _connect(self):
+        if self._connection is None:
+            connection = self.app.extensions['mail'].connect()
+            connection.__enter__()
+            self._connection = connection
+        return self._connection
+
+    def _close(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"Error closing SMTP connection: {e}")
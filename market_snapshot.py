@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+EMPTY_SNAPSHOT = {
+    'nifty_shares': [],
+    'sensex_shares': [],
+    'gainers': [],
+    'losers': [],
+    'updated_at': None
+}
+
+class MarketSnapshot:
+    """Shared cache of the home page market data, refreshed in the background.
+
+    Readers always get the latest snapshot immediately, even when it is past
+    its TTL (stale-while-revalidate); a worker thread re-scrapes every TTL
+    seconds and keeps the previous snapshot if a refresh fails.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.ttl = 300
+        self.retry_interval = 30
+        self._snapshot = None
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config.get('MARKET_SNAPSHOT_TTL', 300)
+        self.retry_interval = app.config.get('MARKET_SNAPSHOT_RETRY', 30)
+        app.extensions['market_snapshot'] = self
+
+    def get(self):
+        """Return the latest snapshot without ever blocking on the network"""
+        self._ensure_worker()
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None else dict(EMPTY_SNAPSHOT)
+
+    def age(self):
+        """Seconds since the last successful refresh, or None before the first"""
+        if self._refreshed_at is None:
+            return None
+        return (datetime.utcnow() - self._refreshed_at).total_seconds()
+
+    def refresh(self):
+        """Scrape all market lists and swap in the new snapshot"""
+        # Imported lazily so the scraper stack is only loaded when used
+        from share_scraper import get_nifty50_shares, get_sensex_shares, get_top_gainers_losers
+
+        with self.app.app_context():
+            nifty_shares = get_nifty50_shares()
+            sensex_shares = get_sensex_shares()
+            gainers, losers = get_top_gainers_losers()
+
+        if not any([nifty_shares, sensex_shares, gainers, losers]):
+            # Keep serving the previous data (or the empty default) and retry soon
+            logger.error("Market snapshot refresh returned no data, keeping previous snapshot")
+            return False
+
+        self._snapshot = {
+            'nifty_shares': nifty_shares,
+            'sensex_shares': sensex_shares,
+            'gainers': gainers,
+            'losers': losers,
+            'updated_at': datetime.utcnow()
+        }
+        self._refreshed_at = self._snapshot['updated_at']
+        logger.info("Market snapshot refreshed")
+        return True
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='market-snapshot', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                ok = self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing market snapshot: {e}")
+                ok = False
+            time.sleep(self.ttl if ok else self.retry_interval)
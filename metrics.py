@@ -0,0 +1,256 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds; the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labels, label_values), value
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: ([*state[0]], state[1], state[2]) for key, state in self._values.items()}
+        for label_values, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield (self.name + '_bucket',
+                       _format_labels(self.labels, label_values, ('le', _format_value(float(bound)))), cumulative)
+            yield self.name + '_sum', _format_labels(self.labels, label_values), total
+            yield self.name + '_count', _format_labels(self.labels, label_values), count
+
+class Metrics:
+    """In-process metrics registry rendered in the Prometheus text format.
+
+    Records per-route latency and per-request SQL query counts and time
+    (through SQLAlchemy cursor events), and takes scraper timings and
+    outcomes from ``observe_scrape``. Cache, tick buffer and mail outbox
+    figures are read from those components when ``/metrics`` is scraped.
+    With the app in debug mode every response carries a Server-Timing
+    header breaking down where the request spent its time.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self._metrics = []
+        self._collectors = []
+        self._listening = False
+
+        self.request_seconds = self.histogram(
+            'http_request_duration_seconds', 'Request latency by route', ('method', 'route', 'status'))
+        self.request_queries = self.histogram(
+            'http_request_db_queries', 'SQL queries issued per request', ('route',), QUERY_COUNT_BUCKETS)
+        self.db_queries = self.counter('db_queries_total', 'SQL statements executed', ('statement',))
+        self.db_seconds = self.histogram('db_query_duration_seconds', 'SQL statement latency', ('statement',))
+        self.scrapes = self.counter(
+            'scrape_requests_total', 'Scraped pages by outcome', ('function', 'exchange', 'outcome'))
+        self.scrape_network_seconds = self.histogram(
+            'scrape_network_seconds', 'Time waiting on the scraped page', ('function', 'exchange'))
+        self.scrape_parse_seconds = self.histogram(
+            'scrape_parse_seconds', 'Time parsing the scraped page', ('function', 'exchange'))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        self.register_collector(_component_samples)
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+
+    def counter(self, name, documentation, labels=()):
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Add a ``collector(app)`` returning (name, type, help, [(labels dict, value)]) tuples"""
+        # init_app runs once per create_app(); a collector must only report once
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def observe_scrape(self, function, exchange, outcome, network_seconds, parse_seconds=None):
+        self.scrapes.inc(function, exchange, outcome)
+        self.scrape_network_seconds.observe(network_seconds, function, exchange)
+        if parse_seconds is not None:
+            self.scrape_parse_seconds.observe(parse_seconds, function, exchange)
+
+    @contextmanager
+    def span(self, name):
+        """Add the time spent in the block to the current request's timing breakdown"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_timing(name, time.perf_counter() - started)
+
+    def _add_timing(self, name, seconds):
+        if not has_request_context():
+            return
+        timings = g.get('_metrics_timings')
+        if timings is not None:
+            timing = timings.setdefault(name, [0.0, 0])
+            timing[0] += seconds
+            timing[1] += 1
+
+    def _start_request(self):
+        g._metrics_started = time.perf_counter()
+        g._metrics_timings = {'db': [0.0, 0]}
+
+    def _finish_request(self, response):
+        started = g.get('_metrics_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        # The URL rule rather than the path, so ids don't become label values
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        self.request_seconds.observe(elapsed, request.method, route, str(response.status_code))
+        timings = g._metrics_timings
+        self.request_queries.observe(timings['db'][1], route)
+
+        if self.app.debug:
+            parts = [f'db;dur={timings["db"][0] * 1000:.1f};desc="{timings["db"][1]} queries"']
+            parts.extend(f'{name};dur={seconds * 1000:.1f}' for name, (seconds, _) in timings.items() if name != 'db')
+            parts.append(f'total;dur={elapsed * 1000:.1f}')
+            response.headers['Server-Timing'] = ', '.join(parts)
+        return response
+
+    # The start time lives on the statement's execution context, so a statement
+    # that fails (and never reaches after_cursor_execute) leaves nothing behind
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_query_start', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        self.db_queries.inc(kind)
+        self.db_seconds.observe(elapsed, kind)
+        self._add_timing('db', elapsed)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            kind = 'histogram' if isinstance(metric, Histogram) else 'counter'
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {kind}')
+            lines.extend(f'{name}{labels} {_format_value(value)}' for name, labels, value in metric.samples())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector(self.app):
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    label_text = _format_labels(tuple(labels), tuple(labels.values()))
+                    lines.append(f'{name}{label_text} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+def _component_samples(app):
+    """Quote cache, tick buffer, mail outbox and market snapshot figures"""
+    from share_scraper import quote_cache
+
+    cache = quote_cache.stats()
+    yield 'quote_cache_lookups_total', 'counter', 'Quote cache lookups by result', [
+        ({'result': result}, cache[result]) for result in ('hits', 'negative_hits', 'misses', 'coalesced')
+    ]
+    yield 'quote_cache_evictions_total', 'counter', 'Quote cache LRU evictions', [({}, cache['evictions'])]
+    yield 'quote_cache_entries', 'gauge', 'Symbols in the quote cache', [({}, cache['size'])]
+    yield 'quote_cache_hit_ratio', 'gauge', 'Share of quote cache lookups served from the cache', [
+        ({}, cache['hit_ratio'])
+    ]
+
+    tick_buffer = app.extensions.get('tick_buffer')
+    if tick_buffer is not None:
+        ticks = tick_buffer.stats()
+        yield 'tick_buffer_rows_total', 'counter', 'Ticks written by the tick buffer', [({}, ticks['rows'])]
+        yield 'tick_buffer_batches_total', 'counter', 'Tick buffer batch writes', [({}, ticks['batches'])]
+        yield 'tick_buffer_flush_seconds_total', 'counter', 'Time spent writing tick batches', [
+            ({}, ticks['flush_seconds'])
+        ]
+        yield 'tick_buffer_events_total', 'counter', 'Tick buffer backpressure and failure events', [
+            ({'event': name}, ticks[name]) for name in ('blocked_puts', 'overflow_writes', 'failed_rows')
+        ]
+        yield 'tick_buffer_pending', 'gauge', 'Ticks waiting to be written', [({}, ticks['pending'])]
+
+    outbox = app.extensions.get('mail_outbox')
+    if outbox is not None:
+        yield 'mail_outbox_pending', 'gauge', 'Emails waiting to be sent', [({}, outbox.pending())]
+
+    snapshot = app.extensions.get('market_snapshot')
+    age = snapshot.age() if snapshot is not None else None
+    if age is not None:
+        yield 'market_snapshot_age_seconds', 'gauge', 'Age of the home page market data', [({}, age)]
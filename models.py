@@ -2,6 +2,9 @@ from flask_login import UserMixin
 from datetime import datetime
 from extensions import db
 
+# Marker for shares whose latest price has not been preloaded
+_NOT_LOADED = object()
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -28,10 +31,11 @@ class Share(db.Model):
 
     @property
     def current_price(self):
-        # Get the latest price from SharePrice table
-        latest_price = SharePrice.query.filter_by(share_name=self.name)\
-            .order_by(SharePrice.last_updated.desc())\
-            .first()
+        # Use the price attached by attach_latest_prices() when available
+        latest_price = getattr(self, '_latest_price', _NOT_LOADED)
+        if latest_price is _NOT_LOADED:
+            # Get the latest price from LatestQuote table
+            latest_price = LatestQuote.query.filter_by(share_name=self.name).first()
         return latest_price.current_price if latest_price else self.buying_price
 
     @property
@@ -53,11 +57,109 @@ class Share(db.Model):
         return (self.profit_loss / self.total_investment) * 100
 
 class SharePrice(db.Model):
+    """Raw price ticks; old rows are rolled up into PriceBar by price_store"""
     id = db.Column(db.Integer, primary_key=True)
     share_name = db.Column(db.String(100), nullable=False)
     current_price = db.Column(db.Float, nullable=False)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_share_price_name_updated', 'share_name', 'last_updated'),
+    )
+
+class LatestQuote(db.Model):
+    """One row per symbol holding its most recent price"""
+    id = db.Column(db.Integer, primary_key=True)
+    share_name = db.Column(db.String(100), unique=True, nullable=False)
+    current_price = db.Column(db.Float, nullable=False)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PriceBar(db.Model):
+    """OHLC bar built from rolled-up ticks ('1m' or '1d' interval)"""
+    id = db.Column(db.Integer, primary_key=True)
+    share_name = db.Column(db.String(100), nullable=False)
+    interval = db.Column(db.String(4), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    tick_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('share_name', 'interval', 'bucket_start', name='uq_price_bar_bucket'),
+    )
+
+class SymbolExchange(db.Model):
+    """Which Google Finance exchange page quotes a symbol (None = not found)"""
+    id = db.Column(db.Integer, primary_key=True)
+    symbol = db.Column(db.String(100), unique=True, nullable=False)
+    exchange = db.Column(db.String(8))
+    retry_after = db.Column(db.DateTime)
+    last_checked = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AccountAggregate(db.Model):
+    """Materialized totals for one trading account, maintained by aggregates.py"""
+    account_id = db.Column(db.Integer, db.ForeignKey('trading_account.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    total_investment = db.Column(db.Float, nullable=False, default=0)
+    current_value = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class UserAggregate(db.Model):
+    """Materialized portfolio totals for one user, maintained by aggregates.py"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_investment = db.Column(db.Float, nullable=False, default=0)
+    current_value = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PriceAlert(db.Model):
+    """One-shot alert: fires when the price reaches above_price or falls to below_price.
+
+    ``kind`` is 'cross' (``value`` is a price) or 'move' (``value`` is a
+    percentage of ``reference_price``, firing in either direction).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    share_name = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.String(8), nullable=False)
+    value = db.Column(db.Float, nullable=False)
+    reference_price = db.Column(db.Float, nullable=False)
+    above_price = db.Column(db.Float)
+    below_price = db.Column(db.Float)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    triggered_at = db.Column(db.DateTime)
+    triggered_price = db.Column(db.Float)
+
+    __table_args__ = (
+        # Active rules are loaded by creation time into the in-memory index
+        db.Index('ix_price_alert_active', 'triggered_at', 'created_at'),
+    )
+
+def load_latest_prices(share_names):
+    """Return {share_name: LatestQuote} for many names in one query"""
+    share_names = set(share_names)
+    if not share_names:
+        return {}
+    rows = LatestQuote.query.filter(LatestQuote.share_name.in_(share_names)).all()
+    return {row.share_name: row for row in rows}
+
+def attach_latest_prices(shares, fresh_prices=None):
+    """Preload the latest price for every share so current_price needs no query.
+
+    ``fresh_prices`` ({name: price}, e.g. just scraped and still queued in
+    the tick buffer) take precedence over the stored quotes.
+    """
+    shares = list(shares)
+    fresh_prices = {name: price for name, price in (fresh_prices or {}).items() if price}
+    prices = load_latest_prices(share.name for share in shares if share.name not in fresh_prices)
+    for name, price in fresh_prices.items():
+        # Transient, never added to the session
+        prices[name] = LatestQuote(share_name=name, current_price=price)
+    for share in shares:
+        share._latest_price = prices.get(share.name)
+    return shares
+
 class VerificationToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -65,6 +167,11 @@ class VerificationToken(db.Model):
     expiry = db.Column(db.DateTime, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_verification_token_token', 'token', unique=True),
+        db.Index('ix_verification_token_expiry', 'expiry'),
+    )
+
 class OTPToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -72,3 +179,8 @@ class OTPToken(db.Model):
     expiry = db.Column(db.DateTime, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_used = db.Column(db.Boolean, default=False)
+
+    __table_args__ = (
+        db.Index('ix_otp_token_user_otp', 'user_id', 'otp'),
+        db.Index('ix_otp_token_expiry', 'expiry'),
+    )
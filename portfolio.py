@@ -0,0 +1,55 @@
+def empty_summary():
+    return {
+        'total_investment': 0,
+        'current_value': 0,
+        'profit_loss': 0,
+        'profit_loss_percentage': 0
+    }
+
+def _add(summary, total_investment, current_value):
+    summary['total_investment'] += total_investment
+    summary['current_value'] += current_value
+    summary['profit_loss'] += current_value - total_investment
+
+def _finish(summary):
+    if summary['total_investment'] > 0:
+        summary['profit_loss_percentage'] = (summary['profit_loss'] / summary['total_investment']) * 100
+    return summary
+
+def summary_from_totals(total_investment, current_value):
+    """Full summary dict from stored investment and value totals"""
+    summary = empty_summary()
+    _add(summary, total_investment, current_value)
+    return _finish(summary)
+
+def summarize(account_ids, holdings):
+    """Aggregate holdings into per-account summaries and a portfolio total.
+
+    ``holdings`` yields (account_id, total_investment, current_value)
+    tuples. Every id in ``account_ids`` gets a summary, even with no
+    holdings. Returns (portfolio_summary, total_portfolio).
+    """
+    portfolio_summary = {account_id: empty_summary() for account_id in account_ids}
+    for account_id, total_investment, current_value in holdings:
+        _add(portfolio_summary.setdefault(account_id, empty_summary()), total_investment, current_value)
+
+    total_portfolio = empty_summary()
+    for summary in portfolio_summary.values():
+        _finish(summary)
+        _add(total_portfolio, summary['total_investment'], summary['current_value'])
+    return portfolio_summary, _finish(total_portfolio)
+
+def holding_values(quantity, buying_price, current_price):
+    """Per-holding figures matching the Share model properties"""
+    if current_price is None:
+        current_price = buying_price
+    total_investment = quantity * buying_price
+    current_value = quantity * current_price
+    profit_loss = current_value - total_investment
+    return {
+        'current_price': current_price,
+        'total_investment': total_investment,
+        'current_value': current_value,
+        'profit_loss': profit_loss,
+        'profit_loss_percentage': (profit_loss / total_investment) * 100 if total_investment else 0
+    }
@@ -0,0 +1,213 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from models import SharePrice, LatestQuote, PriceBar, SymbolExchange, db
+from aggregates import apply_price_changes
+from extensions import bar_store
+from alerts import check_alerts
+
+logger = logging.getLogger(__name__)
+
+# How long raw ticks and minute bars are kept before being rolled up
+TICK_RETENTION = timedelta(days=1)
+MINUTE_BAR_RETENTION = timedelta(days=30)
+
+# How long a symbol found on neither exchange is skipped before retrying
+UNKNOWN_SYMBOL_RETRY = timedelta(hours=6)
+
+def record_ticks(ticks):
+    """Store (share_name, price, timestamp) ticks in one transaction.
+
+    Appends one SharePrice row per tick with a single multi-row insert
+    and upserts the LatestQuote row used for O(1) current price lookups
+    with the newest tick per symbol. The ticks are then folded into the
+    bar store's current bars and checked against the price alert index,
+    in time order.
+    """
+    ticks = sorted((tick for tick in ticks if tick[1]), key=lambda tick: tick[2])
+    if not ticks:
+        return
+
+    try:
+        _write_ticks(ticks)
+    except IntegrityError:
+        # Another writer created some of the LatestQuote rows first; retry as updates
+        db.session.rollback()
+        _write_ticks(ticks)
+    # Keep the on-disk bar history in step with the stored ticks
+    for name, price, timestamp in ticks:
+        bar_store.append_ticks({name: price}, timestamp)
+    try:
+        check_alerts([(name, price) for name, price, _ in ticks])
+    except Exception as e:
+        logger.error(f"Error checking price alerts: {e}")
+        db.session.rollback()
+
+def _write_ticks(ticks):
+    db.session.execute(db.insert(SharePrice), [
+        {'share_name': name, 'current_price': price, 'last_updated': timestamp}
+        for name, price, timestamp in ticks
+    ])
+    # Ticks are in time order, so the last one per symbol wins
+    latest = {name: (price, timestamp) for name, price, timestamp in ticks}
+    changes = _upsert_latest(latest)
+    # Revalue held positions in the same transaction as the quote
+    apply_price_changes(changes)
+    db.session.commit()
+
+def _upsert_latest(latest):
+    """Upsert LatestQuote rows from {name: (price, timestamp)}.
+
+    Returns {name: (old_price, new_price)} for the rows actually changed.
+    """
+    changes = {}
+    # Row locks (taken in name order) serialise concurrent writers of the same
+    # symbols, so each old -> new delta is computed from the committed price
+    # and applied to the aggregates exactly once
+    existing = {
+        row.share_name: row
+        for row in LatestQuote.query.filter(LatestQuote.share_name.in_(latest))
+        .order_by(LatestQuote.share_name)
+        .with_for_update()
+        .all()
+    }
+    for name, (price, timestamp) in latest.items():
+        quote = existing.get(name)
+        if quote:
+            # Never let a late-arriving older quote overwrite a newer one
+            if quote.last_updated and quote.last_updated > timestamp:
+                continue
+            changes[name] = (quote.current_price, price)
+            quote.current_price = price
+            quote.last_updated = timestamp
+        else:
+            changes[name] = (None, price)
+            db.session.add(LatestQuote(share_name=name, current_price=price, last_updated=timestamp))
+    db.session.flush()
+    return changes
+
+def load_exchanges(symbols):
+    """Return {symbol: SymbolExchange} for the given symbols in one query"""
+    symbols = set(symbols)
+    if not symbols:
+        return {}
+    rows = SymbolExchange.query.filter(SymbolExchange.symbol.in_(symbols)).all()
+    return {row.symbol: row for row in rows}
+
+def record_exchanges(resolved):
+    """Remember where each symbol was found; None marks it unknown for a while"""
+    if not resolved:
+        return
+    now = datetime.utcnow()
+    existing = load_exchanges(resolved)
+    for symbol, exchange in resolved.items():
+        row = existing.get(symbol)
+        if row is None:
+            row = SymbolExchange(symbol=symbol)
+            db.session.add(row)
+        row.exchange = exchange
+        row.retry_after = None if exchange else now + UNKNOWN_SYMBOL_RETRY
+        row.last_checked = now
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent writer resolved the same symbol; its answer is as good
+        db.session.rollback()
+
+def _bucket(timestamp, interval):
+    if interval == '1m':
+        return timestamp.replace(second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _merge_bars(name, interval, bars):
+    """Write one symbol's aggregated bars, combining with any already stored"""
+    if not bars:
+        return
+    stored = {
+        bar.bucket_start: bar
+        for bar in PriceBar.query.filter(
+            PriceBar.share_name == name,
+            PriceBar.interval == interval,
+            PriceBar.bucket_start.in_(bars)
+        ).all()
+    }
+    for bucket_start, bar in bars.items():
+        existing = stored.get(bucket_start)
+        if existing:
+            # Only late-arriving ticks land in an already rolled-up bucket
+            existing.high = max(existing.high, bar['high'])
+            existing.low = min(existing.low, bar['low'])
+            existing.close = bar['close']
+            existing.tick_count += bar['tick_count']
+        else:
+            db.session.add(PriceBar(
+                share_name=name,
+                interval=interval,
+                bucket_start=bucket_start,
+                **bar
+            ))
+    db.session.flush()
+
+def _aggregate(bars, interval, timestamp, open_, high, low, close, count):
+    bucket_start = _bucket(timestamp, interval)
+    bar = bars.get(bucket_start)
+    if bar is None:
+        bars[bucket_start] = {'open': open_, 'high': high, 'low': low, 'close': close, 'tick_count': count}
+    else:
+        bar['high'] = max(bar['high'], high)
+        bar['low'] = min(bar['low'], low)
+        bar['close'] = close
+        bar['tick_count'] += count
+
+def _rollup_ticks(cutoff):
+    names = [name for (name,) in db.session.query(SharePrice.share_name)
+             .filter(SharePrice.last_updated < cutoff).distinct()]
+    count = 0
+    # One symbol at a time keeps memory bounded by a single symbol's history
+    for name in names:
+        bars = {}
+        ticks = db.session.query(SharePrice.last_updated, SharePrice.current_price)\
+            .filter(SharePrice.share_name == name, SharePrice.last_updated < cutoff)\
+            .order_by(SharePrice.last_updated, SharePrice.id)\
+            .all()
+        for timestamp, price in ticks:
+            _aggregate(bars, '1m', timestamp, price, price, price, price, 1)
+        _merge_bars(name, '1m', bars)
+        count += len(ticks)
+    SharePrice.query.filter(SharePrice.last_updated < cutoff).delete(synchronize_session=False)
+    return count
+
+def _rollup_minute_bars(cutoff):
+    old_bars = db.and_(PriceBar.interval == '1m', PriceBar.bucket_start < cutoff)
+    names = [name for (name,) in db.session.query(PriceBar.share_name).filter(old_bars).distinct()]
+    count = 0
+    for name in names:
+        bars = {}
+        minute_bars = PriceBar.query.filter(old_bars, PriceBar.share_name == name)\
+            .order_by(PriceBar.bucket_start)\
+            .all()
+        for bar in minute_bars:
+            _aggregate(bars, '1d', bar.bucket_start, bar.open, bar.high, bar.low, bar.close, bar.tick_count)
+        _merge_bars(name, '1d', bars)
+        count += len(minute_bars)
+    PriceBar.query.filter(old_bars).delete(synchronize_session=False)
+    return count
+
+def rollup_ticks(now=None):
+    """Roll old ticks into minute bars and old minute bars into daily bars.
+
+    Cutoffs are aligned to bucket boundaries so a bucket is never split
+    between two runs. Rolled-up source rows are deleted, keeping the tick
+    table bounded. Returns (ticks_rolled, minute_bars_rolled).
+    """
+    now = now or datetime.utcnow()
+    try:
+        tick_count = _rollup_ticks(_bucket(now - TICK_RETENTION, '1m'))
+        minute_count = _rollup_minute_bars(_bucket(now - MINUTE_BAR_RETENTION, '1d'))
+        db.session.commit()
+        logger.info(f"Rolled up {tick_count} ticks and {minute_count} minute bars")
+        return tick_count, minute_count
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rolling up price ticks: {e}")
+        raise
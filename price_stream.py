@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Quotes are stamped before their transaction commits, so re-read a short
+# window on every poll; unchanged prices are filtered out by publish()
+POLL_LOOKBACK = timedelta(seconds=30)
+
+class Subscription:
+    """One connected client's view of the price feed.
+
+    Changes are merged into one pending {symbol: price} dict, so a client
+    that falls behind gets the newest price of every symbol on its next
+    read rather than a backlog, and no update is ever dropped.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = frozenset(symbols)
+        self._pending = {}
+        self._ready = threading.Condition()
+
+    def publish(self, changes):
+        with self._ready:
+            self._pending.update(changes)
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """Next {symbol: price} change set, or None after ``timeout`` seconds"""
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._pending, timeout):
+                return None
+            changes, self._pending = self._pending, {}
+            return changes
+
+class PriceBroadcaster:
+    """Shared fan-out of LatestQuote changes to streaming clients.
+
+    One poller thread per process reads the LatestQuote rows updated since
+    its last pass, for the union of all subscribed symbols, and pushes only
+    the symbols whose price actually changed to the subscribers watching
+    them. Clients never query the database themselves.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.poll_interval = 2
+        self._subscribers = {}  # symbol -> set of Subscription
+        self._prices = {}  # symbol -> last published price
+        self._since = None
+        self._lock = threading.Lock()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('PRICE_STREAM_POLL_INTERVAL', 2)
+        app.extensions['price_broadcaster'] = self
+
+    def subscribe(self, symbols, initial_prices=None):
+        subscription = Subscription(symbols)
+        with self._lock:
+            for symbol in subscription.symbols:
+                self._subscribers.setdefault(symbol, set()).add(subscription)
+                if initial_prices and symbol not in self._prices and initial_prices.get(symbol) is not None:
+                    self._prices[symbol] = initial_prices[symbol]
+        self._ensure_worker()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for symbol in subscription.symbols:
+                watchers = self._subscribers.get(symbol)
+                if watchers is None:
+                    continue
+                watchers.discard(subscription)
+                if not watchers:
+                    del self._subscribers[symbol]
+                    self._prices.pop(symbol, None)
+
+    def publish(self, prices):
+        """Fan out {symbol: price}, skipping symbols whose price is unchanged"""
+        targets = {}
+        with self._lock:
+            for symbol, price in prices.items():
+                if symbol not in self._subscribers or self._prices.get(symbol) == price:
+                    continue
+                self._prices[symbol] = price
+                for subscription in self._subscribers[symbol]:
+                    targets.setdefault(subscription, {})[symbol] = price
+        for subscription, changes in targets.items():
+            subscription.publish(changes)
+        return len(targets)
+
+    def poll(self):
+        """Read quotes updated since the last poll and publish the changes"""
+        from models import LatestQuote, db
+
+        with self._lock:
+            symbols = list(self._subscribers)
+        if not symbols:
+            return 0
+
+        started = datetime.utcnow()
+        query = LatestQuote.query.filter(LatestQuote.share_name.in_(symbols))
+        if self._since is not None:
+            query = query.filter(LatestQuote.last_updated >= self._since)
+        rows = query.all()
+        db.session.remove()
+        self._since = started - POLL_LOOKBACK
+        return self.publish({row.share_name: row.current_price for row in rows})
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='price-broadcaster', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.poll()
+            except Exception as e:
+                logger.error(f"Error polling price updates: {e}")
+            time.sleep(self.poll_interval)
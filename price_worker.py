@@ -0,0 +1,142 @@
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from models import Share, TradingAccount, db, load_latest_prices
+from share_scraper import get_share_prices, PRICE_CACHE_SECONDS
+from price_store import rollup_ticks, record_ticks
+from quote_sources import ScraperQuoteSource, SOURCES, create_source
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 60  # seconds between refresh cycles
+DEFAULT_MAX_SYMBOLS = 200  # scrape budget per cycle
+DEFAULT_ROLLUP_INTERVAL = 3600
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds between writes of pushed ticks
+
+def held_symbols():
+    """Return (symbol, holder_count) for every held symbol, most widely held first"""
+    holders = db.func.count(db.distinct(TradingAccount.user_id))
+    return db.session.query(Share.name, holders)\
+        .join(TradingAccount)\
+        .group_by(Share.name)\
+        .order_by(holders.desc(), Share.name)\
+        .all()
+
+def due_symbols(max_symbols):
+    """Pick the stale held symbols to refresh this cycle, by priority"""
+    held = held_symbols()
+    quotes = load_latest_prices(name for name, _ in held)
+    cutoff = datetime.utcnow() - timedelta(seconds=PRICE_CACHE_SECONDS)
+
+    due = [
+        name for name, _ in held
+        if name not in quotes or quotes[name].last_updated < cutoff
+    ]
+    return due[:max_symbols]
+
+def refresh_cycle(max_symbols=DEFAULT_MAX_SYMBOLS, source=None):
+    """Refresh one batch of due symbols; returns (attempted, refreshed)"""
+    symbols = due_symbols(max_symbols)
+    if not symbols:
+        return 0, 0
+    prices = source.fetch(symbols) if source is not None else get_share_prices(symbols)
+    refreshed = sum(1 for price in prices.values() if price)
+    logger.info(f"Refreshed {refreshed}/{len(symbols)} symbols")
+    return len(symbols), refreshed
+
+def subscribe_held(source):
+    """Point a push source at the currently held symbols"""
+    source.subscribe([name for name, _ in held_symbols()])
+
+def flush_cycle(source):
+    """Store the ticks a push source received since the last flush"""
+    ticks = source.drain()
+    if ticks:
+        record_ticks(ticks)
+    return len(ticks)
+
+def run_worker(app, interval=DEFAULT_INTERVAL, max_symbols=DEFAULT_MAX_SYMBOLS,
+               rollup_interval=DEFAULT_ROLLUP_INTERVAL, once=False, source=None,
+               flush_interval=DEFAULT_FLUSH_INTERVAL):
+    """Refresh held symbols until interrupted.
+
+    Polling sources are asked for the due symbols every ``interval``
+    seconds. Push sources are re-pointed at the held symbols every
+    ``interval`` seconds and their ticks are stored every
+    ``flush_interval`` seconds; a finite feed stops the worker once it
+    has been played out.
+    """
+    source = source or ScraperQuoteSource()
+    if source.push:
+        with app.app_context():
+            subscribe_held(source)
+            db.session.remove()
+    source.start()
+
+    last_rollup = last_subscribe = time.monotonic()
+    try:
+        while True:
+            started = time.monotonic()
+            done = source.exhausted()
+            with app.app_context():
+                try:
+                    if source.push:
+                        if started - last_subscribe >= interval:
+                            subscribe_held(source)
+                            last_subscribe = started
+                        flush_cycle(source)
+                    else:
+                        refresh_cycle(max_symbols, source)
+                    if rollup_interval and started - last_rollup >= rollup_interval:
+                        rollup_ticks()
+                        last_rollup = started
+                except Exception as e:
+                    logger.error(f"Error in price refresh cycle: {e}")
+                finally:
+                    db.session.remove()
+
+            if once or done:
+                return
+            step = flush_interval if source.push else interval
+            time.sleep(max(0, step - (time.monotonic() - started)))
+    finally:
+        source.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m share_scraper')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    worker = subparsers.add_parser('worker', help='Refresh held share prices on a schedule')
+    worker.add_argument('--interval', type=int, default=DEFAULT_INTERVAL,
+                        help='Seconds between refresh cycles')
+    worker.add_argument('--max-symbols', type=int, default=DEFAULT_MAX_SYMBOLS,
+                        help='Maximum symbols scraped per cycle')
+    worker.add_argument('--rollup-interval', type=int, default=DEFAULT_ROLLUP_INTERVAL,
+                        help='Seconds between tick rollups (0 to disable)')
+    worker.add_argument('--once', action='store_true', help='Run a single cycle and exit')
+    worker.add_argument('--source', choices=SOURCES, help='Quote source (default: QUOTE_SOURCE or scraper)')
+    worker.add_argument('--flush-interval', type=float, default=DEFAULT_FLUSH_INTERVAL,
+                        help='Seconds between writes of pushed ticks')
+    worker.add_argument('--replay-file', help='Recorded timestamp,symbol,price CSV for --source replay')
+    worker.add_argument('--speed', type=float, help='Replay speed factor (0 = as fast as possible)')
+    worker.add_argument('--loop', action='store_true', help='Restart the replay file when it ends')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    app = create_app()
+    config = dict(app.config)
+    if args.replay_file:
+        config['REPLAY_FILE'] = args.replay_file
+    if args.speed is not None:
+        config['REPLAY_SPEED'] = args.speed
+    if args.loop:
+        config['REPLAY_LOOP'] = True
+    source = create_source(config, args.source)
+    logger.info(f"Starting price worker with {type(source).__name__} "
+                f"(every {args.interval}s, up to {args.max_symbols} symbols)")
+    try:
+        run_worker(app, args.interval, args.max_symbols, args.rollup_interval, args.once,
+                   source=source, flush_interval=args.flush_interval)
+    except KeyboardInterrupt:
+        logger.info("Price worker stopped")
+    return 0
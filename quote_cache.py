@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+
+class _Flight:
+    """An in-progress upstream fetch that concurrent callers wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class QuoteCache:
+    """Thread-safe in-process price cache.
+
+    Entries expire after ``ttl`` seconds (``negative_ttl`` for lookups that
+    found no price), the least recently used entry is evicted once
+    ``max_entries`` is reached, and concurrent misses for the same symbol
+    share a single call to the loader.
+    """
+
+    def __init__(self, ttl=60, negative_ttl=30, max_entries=5000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0
+        }
+
+    def _lookup(self, symbol):
+        # Caller must hold the lock
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[symbol]
+            return None
+        self._entries.move_to_end(symbol)
+        return entry
+
+    def get(self, symbol):
+        """Return (found, price); price is None for a cached failed lookup"""
+        with self._lock:
+            entry = self._lookup(symbol)
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            self._stats['hits' if entry[0] is not None else 'negative_hits'] += 1
+            return True, entry[0]
+
+    def put(self, symbol, price, ttl=None):
+        """Cache a price, or a negative entry when price is None"""
+        if ttl is None:
+            ttl = self.ttl if price is not None else self.negative_ttl
+        with self._lock:
+            self._entries[symbol] = (price, time.monotonic() + ttl)
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(symbol, None)
+
+    def get_or_fetch(self, symbol, loader, counted=False):
+        """Return the cached price or load it, coalescing concurrent misses.
+
+        Only one caller per symbol runs ``loader(symbol)``; others block
+        until it finishes and receive the same result or exception. Pass
+        ``counted=True`` when a get() for this lookup already recorded a
+        miss, so the lookup is counted once, by its final outcome.
+        """
+        with self._lock:
+            entry = self._lookup(symbol)
+            flight = self._inflight.get(symbol) if entry is None else None
+            leader = entry is None and flight is None
+            if entry is not None:
+                outcome = 'hits' if entry[0] is not None else 'negative_hits'
+            elif leader:
+                flight = self._inflight[symbol] = _Flight()
+                outcome = 'misses'
+            else:
+                outcome = 'coalesced'
+            if counted:
+                self._stats['misses'] -= 1
+            self._stats[outcome] += 1
+            if entry is not None:
+                return entry[0]
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader(symbol)
+            self.put(symbol, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(symbol, None)
+            flight.event.set()
+
+    def stats(self):
+        """Counters for monitoring, plus the current entry count"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['negative_hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_ratio'] = (stats['hits'] + stats['negative_hits']) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,141 @@
+import logging
+import os
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+except ImportError:  # lxml is optional; fall back to BeautifulSoup
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+# Google Finance markup
+PRICE_CLASS = 'YMlKec fxKbKc'
+ROW_CLASS = 'SxcTic'
+ROW_SYMBOL_CLASS = 'ZvmM7'
+ROW_PRICE_CLASS = 'YMlKec'
+ROW_CHANGE_CLASS = 'JwB6zf'
+
+BACKENDS = ('lxml', 'strainer', 'soup')
+
+def clean_number(text):
+    """Clean number string by removing commas, spaces, and converting percentage"""
+    if not text:
+        return 0
+    try:
+        # Remove currency symbols, commas, spaces, and % symbol
+        cleaned = text.replace('₹', '').replace(',', '').replace(' ', '').replace('%', '').strip()
+        if cleaned:
+            return float(cleaned)
+        return 0
+    except ValueError:
+        return 0
+
+def default_backend():
+    """Backend from QUOTE_PARSER, else lxml when installed, else strainer"""
+    backend = os.getenv('QUOTE_PARSER', '').lower()
+    if backend in BACKENDS and (backend != 'lxml' or lxml is not None):
+        return backend
+    return 'lxml' if lxml is not None else 'strainer'
+
+def _row_data(symbol_text, price_text, change_text):
+    """Build the constituent dict used by the templates from raw cell text"""
+    change = clean_number(change_text.split('(')[0]) if change_text is not None else 0
+    change_percent = clean_number(change_text.split('(')[1].split(')')[0]) \
+        if change_text is not None and '(' in change_text else 0
+    return {
+        'symbol': symbol_text.strip(),
+        'ltp': clean_number(price_text) if price_text is not None else 0,
+        'change': change,
+        'percentageChange': change_percent
+    }
+
+# --- BeautifulSoup: full tree (original behaviour) ------------------------
+
+def _soup_price(html, parse_only=None):
+    soup = BeautifulSoup(html, 'html.parser', parse_only=parse_only)
+    price_div = soup.find('div', {'class': PRICE_CLASS})
+    return price_div.text if price_div else None
+
+def _soup_rows(html, limit, parse_only=None):
+    soup = BeautifulSoup(html, 'html.parser', parse_only=parse_only)
+    rows = []
+    for constituent in soup.find_all('div', {'class': ROW_CLASS})[:limit]:
+        symbol_div = constituent.find('div', {'class': ROW_SYMBOL_CLASS})
+        price_div = constituent.find('div', {'class': ROW_PRICE_CLASS})
+        change_div = constituent.find('div', {'class': ROW_CHANGE_CLASS})
+        rows.append((
+            symbol_div.text if symbol_div else None,
+            price_div.text if price_div else None,
+            change_div.text if change_div else None
+        ))
+    return rows
+
+# --- SoupStrainer: only materialise the nodes we read ---------------------
+
+_PRICE_STRAINER = SoupStrainer('div', class_=PRICE_CLASS)
+_ROW_STRAINER = SoupStrainer('div', class_=ROW_CLASS)
+
+def _strainer_price(html):
+    return _soup_price(html, parse_only=_PRICE_STRAINER)
+
+def _strainer_rows(html, limit):
+    return _soup_rows(html, limit, parse_only=_ROW_STRAINER)
+
+# --- lxml: C parser with XPath lookups ------------------------------------
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+_LXML_PRICE = f"//div[@class='{PRICE_CLASS}']"
+_LXML_ROWS = f"//div[{_has_class(ROW_CLASS)}]"
+_LXML_CELL = ".//div[{}]"
+
+def _lxml_price(html):
+    nodes = lxml.html.fromstring(html).xpath(_LXML_PRICE)
+    return nodes[0].text_content() if nodes else None
+
+def _lxml_rows(html, limit):
+    def cell(row, name):
+        nodes = row.xpath(_LXML_CELL.format(_has_class(name)))
+        return nodes[0].text_content() if nodes else None
+
+    rows = []
+    for row in lxml.html.fromstring(html).xpath(_LXML_ROWS)[:limit]:
+        rows.append((
+            cell(row, ROW_SYMBOL_CLASS),
+            cell(row, ROW_PRICE_CLASS),
+            cell(row, ROW_CHANGE_CLASS)
+        ))
+    return rows
+
+_PRICE_PARSERS = {'lxml': _lxml_price, 'strainer': _strainer_price, 'soup': _soup_price}
+_ROW_PARSERS = {'lxml': _lxml_rows, 'strainer': _strainer_rows, 'soup': _soup_rows}
+
+def _run(parsers, backend, *args):
+    backend = backend or default_backend()
+    try:
+        return parsers[backend](*args)
+    except Exception as e:
+        if backend == 'soup':
+            raise
+        logger.error(f"{backend} parser failed, falling back to BeautifulSoup: {e}")
+        return parsers['soup'](*args)
+
+def parse_price(html, backend=None):
+    """Return the quote page's price as a float, or None if not found"""
+    text = _run(_PRICE_PARSERS, backend, html)
+    if text is None:
+        return None
+    price = clean_number(text)
+    return price if price > 0 else None
+
+def parse_constituents(html, limit, backend=None):
+    """Return up to ``limit`` constituent rows from an index or market list page"""
+    shares = []
+    for symbol_text, price_text, change_text in _run(_ROW_PARSERS, backend, html, limit):
+        if symbol_text is None:
+            logger.error("Error parsing constituent data: missing symbol")
+            continue
+        shares.append(_row_data(symbol_text, price_text, change_text))
+    return shares
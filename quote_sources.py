@@ -0,0 +1,255 @@
+"""Where the price worker gets its quotes from.
+
+Polling sources (the Google Finance scraper) implement ``fetch`` and are
+asked for the symbols that are due on every cycle. Push sources (the
+Breeze tick feed and the replay feed) deliver timestamped ticks on their
+own thread; the worker only tells them which symbols are held and drains
+the buffered ticks into ``record_ticks`` on each flush.
+"""
+import csv
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ('scraper', 'breeze', 'replay')
+
+class QuoteSource:
+    """Base class; push sources buffer ticks until the worker drains them"""
+
+    push = False
+    # Keep only the newest buffered tick per symbol (False keeps every tick)
+    coalesce = True
+
+    def __init__(self):
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self.ticks_received = 0
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def subscribe(self, symbols):
+        """Make sure ``symbols`` are being watched (push sources)"""
+
+    def exhausted(self):
+        """True once a finite feed has delivered everything it will"""
+        return False
+
+    def _emit(self, symbol, price, timestamp=None):
+        """Buffer a tick taken at ``timestamp`` (default: now)"""
+        if not price:
+            return
+        tick = (symbol, price, timestamp or datetime.utcnow())
+        with self._pending_lock:
+            self._pending[symbol if self.coalesce else self.ticks_received] = tick
+            self.ticks_received += 1
+
+    def drain(self):
+        """Take the (symbol, price, timestamp) ticks received since the last drain"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        return list(pending.values())
+
+class ScraperQuoteSource(QuoteSource):
+    """Google Finance pages, scraped on demand"""
+
+    def fetch(self, symbols):
+        """Return {symbol: price} for ``symbols``"""
+        from share_scraper import get_share_prices
+        return get_share_prices(symbols)
+
+class BreezeQuoteSource(QuoteSource):
+    """ICICI Direct Breeze websocket tick feed.
+
+    Symbols are mapped to Breeze stock codes and feed tokens, either from
+    a ``symbol,stock_code,token`` CSV (``symbol_map_path``) or via the
+    API's name lookup, and ticks are matched back by token.
+    """
+
+    push = True
+
+    def __init__(self, api_key, api_secret, session_token, exchange='NSE', symbol_map_path=None):
+        super().__init__()
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.session_token = session_token
+        self.exchange = exchange
+        self.symbol_map = self._load_symbol_map(symbol_map_path)
+        self._client = None
+        self._wanted = set()
+        self._subscribed = {}  # symbol -> (stock_code, token)
+        self._by_token = {}
+
+    @staticmethod
+    def _load_symbol_map(path):
+        if not path:
+            return {}
+        with open(path, newline='', encoding='utf-8') as f:
+            return {row[0].strip(): (row[1].strip(), row[2].strip()) for row in csv.reader(f) if len(row) >= 3}
+
+    def start(self):
+        from breeze_connect import BreezeConnect
+
+        client = BreezeConnect(api_key=self.api_key)
+        client.generate_session(api_secret=self.api_secret, session_token=self.session_token)
+        client.on_ticks = self._on_ticks
+        client.ws_connect()
+        self._client = client
+        logger.info("Connected to Breeze tick feed")
+        self.subscribe(self._wanted)
+
+    def stop(self):
+        if self._client is not None:
+            try:
+                self._client.ws_disconnect()
+            except Exception as e:
+                logger.error(f"Error disconnecting from Breeze: {e}")
+            self._client = None
+
+    def _resolve(self, symbol):
+        if symbol in self.symbol_map:
+            return self.symbol_map[symbol]
+        names = self._client.get_names(exchange_code=self.exchange, stock_code=symbol)
+        return names['isec_stock_code'], names['isec_token_level1']
+
+    def subscribe(self, symbols):
+        self._wanted = set(symbols)
+        if self._client is None:
+            return  # subscribed once connected
+        for symbol in self._wanted - set(self._subscribed):
+            try:
+                stock_code, token = self._resolve(symbol)
+                self._client.subscribe_feeds(exchange_code=self.exchange, stock_code=stock_code,
+                                             product_type='cash', get_exchange_quotes=True,
+                                             get_market_depth=False)
+                self._subscribed[symbol] = (stock_code, token)
+                self._by_token[token] = symbol
+            except Exception as e:
+                logger.error(f"Error subscribing {symbol} on Breeze: {e}")
+        for symbol in set(self._subscribed) - self._wanted:
+            stock_code, token = self._subscribed.pop(symbol)
+            self._by_token.pop(token, None)
+            try:
+                self._client.unsubscribe_feeds(exchange_code=self.exchange, stock_code=stock_code,
+                                               product_type='cash', get_exchange_quotes=True,
+                                               get_market_depth=False)
+            except Exception as e:
+                logger.error(f"Error unsubscribing {symbol} on Breeze: {e}")
+
+    def _on_ticks(self, tick):
+        # Called on the Breeze socket thread
+        symbol = self._by_token.get(tick.get('symbol'))
+        if symbol is not None:
+            try:
+                self._emit(symbol, float(tick.get('last') or 0))
+            except (TypeError, ValueError):
+                pass
+
+class ReplayQuoteSource(QuoteSource):
+    """Plays ``timestamp,symbol,price`` ticks from a CSV file.
+
+    Ticks are replayed in file order with their original spacing divided
+    by ``speed`` (0 plays as fast as possible), so a run is repeatable.
+    ``loop`` starts over at the end of the file. Ticks are only
+    published for subscribed symbols unless ``all_symbols`` is set.
+    Every tick is stored with its recorded timestamp, so the stored
+    history matches the captured session.
+    """
+
+    push = True
+    coalesce = False
+
+    def __init__(self, path, speed=1.0, loop=False, all_symbols=False):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.all_symbols = all_symbols
+        self.finished = threading.Event()
+        self._symbols = frozenset()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.finished.clear()
+        self._thread = threading.Thread(target=self._run, name='quote-replay', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def subscribe(self, symbols):
+        self._symbols = frozenset(symbols)
+
+    def exhausted(self):
+        return self.finished.is_set()
+
+    def ticks(self):
+        """Yield (timestamp, symbol, price) rows from the file"""
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if len(row) < 3:
+                    continue
+                try:
+                    yield datetime.fromisoformat(row[0]), row[1].strip(), float(row[2])
+                except ValueError:
+                    continue  # header or malformed row
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                self._play()
+                if not self.loop:
+                    break
+        except Exception as e:
+            logger.error(f"Error replaying {self.path}: {e}")
+        finally:
+            self.finished.set()
+
+    def _play(self):
+        first = None
+        started = time.monotonic()
+        for timestamp, symbol, price in self.ticks():
+            if self._stop.is_set():
+                return
+            if first is None:
+                first = timestamp
+            if self.speed > 0:
+                due = started + (timestamp - first).total_seconds() / self.speed
+                delay = due - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    return
+            if self.all_symbols or symbol in self._symbols:
+                self._emit(symbol, price, timestamp)
+
+def create_source(config, name=None):
+    """Build the quote source named by ``name`` or the QUOTE_SOURCE setting"""
+    name = (name or config.get('QUOTE_SOURCE') or 'scraper').lower()
+    if name == 'scraper':
+        return ScraperQuoteSource()
+    if name == 'breeze':
+        return BreezeQuoteSource(
+            config.get('BREEZE_API_KEY'),
+            config.get('BREEZE_API_SECRET'),
+            config.get('BREEZE_SESSION_TOKEN'),
+            exchange=config.get('BREEZE_EXCHANGE', 'NSE'),
+            symbol_map_path=config.get('BREEZE_SYMBOL_MAP')
+        )
+    if name == 'replay':
+        if not config.get('REPLAY_FILE'):
+            raise ValueError("REPLAY_FILE must be set for the replay quote source")
+        return ReplayQuoteSource(
+            config['REPLAY_FILE'],
+            speed=config.get('REPLAY_SPEED', 1.0),
+            loop=config.get('REPLAY_LOOP', False)
+        )
+    raise ValueError(f"Unknown quote source {name!r} (expected one of {', '.join(SOURCES)})")
@@ -1,15 +1,29 @@
-from flask import render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, session, Response, jsonify, abort
 from flask_login import login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import selectinload
 from flask_mail import Message
-from app import app
-from extensions import db, mail
-from models import User, TradingAccount, Share, SharePrice, VerificationToken, OTPToken
-from share_scraper import get_share_price, get_nifty50_shares, get_sensex_shares, get_top_gainers_losers
+from extensions import db, mail_outbox, market_snapshot, price_broadcaster, bar_store, metrics, token_store
+from bar_store import INTERVALS as BAR_INTERVALS, naive_utc
+from models import User, TradingAccount, Share, PriceAlert, attach_latest_prices, load_latest_prices
+from portfolio import summarize, holding_values
+import aggregates
+from alerts import alert_index, thresholds
+from holdings_import import import_holdings, prewarm_prices_in_background, HoldingsImportError
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+import codecs
 import secrets
+import json
+import hashlib
 import random
 from datetime import datetime, timedelta
 
+bp = Blueprint('main', __name__)
+
+OTP_TTL = timedelta(minutes=10)
+VERIFY_EMAIL_TTL = timedelta(hours=24)
+RESET_PASSWORD_TTL = timedelta(hours=1)
+
 def generate_otp():
     return ''.join([str(random.randint(0, 9)) for _ in range(6)])
 
@@ -21,20 +35,19 @@ def send_otp_email(user, otp):
                              user=user,
                              otp=otp,
                              year=datetime.utcnow().year)
-    mail.send(msg)
+    mail_outbox.send(msg)
 
-@app.route('/')
+@bp.route('/')
 def home():
-    nifty_shares = get_nifty50_shares()
-    sensex_shares = get_sensex_shares()
-    gainers, losers = get_top_gainers_losers()
+    # Served from the background-refreshed cache, never scraped inline
+    snapshot = market_snapshot.get()
     return render_template('home.html', 
-                         nifty_shares=nifty_shares,
-                         sensex_shares=sensex_shares,
-                         gainers=gainers,
-                         losers=losers)
+                         nifty_shares=snapshot['nifty_shares'],
+                         sensex_shares=snapshot['sensex_shares'],
+                         gainers=snapshot['gainers'],
+                         losers=snapshot['losers'])
 
-@app.route('/signup', methods=['GET', 'POST'])
+@bp.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -44,15 +57,15 @@ def signup():
 
         if password != confirm_password:
             flash('Passwords do not match!', 'error')
-            return redirect(url_for('signup'))
+            return redirect(url_for('main.signup'))
 
         if User.query.filter_by(email=email).first():
             flash('Email already registered!', 'error')
-            return redirect(url_for('signup'))
+            return redirect(url_for('main.signup'))
 
         if User.query.filter_by(username=username).first():
             flash('Username already taken!', 'error')
-            return redirect(url_for('signup'))
+            return redirect(url_for('main.signup'))
 
         user = User(
             username=username,
@@ -64,30 +77,24 @@ def signup():
 
         # Generate verification token
         token = secrets.token_urlsafe(32)
-        ver_token = VerificationToken(
-            user_id=user.id,
-            token=token,
-            expiry=datetime.utcnow() + timedelta(hours=24)
-        )
-        db.session.add(ver_token)
-        db.session.commit()
+        token_store.issue_token(user.id, token, VERIFY_EMAIL_TTL)
 
         # Send verification email with HTML template
         msg = Message('Verify your email',
                      sender='noreply@shareportfolio.com',
                      recipients=[email])
-        verify_url = url_for('verify_email', token=token, _external=True)
+        verify_url = url_for('main.verify_email', token=token, _external=True)
         msg.html = render_template('emails/verification_email.html',
                                  verify_url=verify_url,
                                  year=datetime.utcnow().year)
-        mail.send(msg)
+        mail_outbox.send(msg)
 
         flash('Please check your email to verify your account!', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     return render_template('signup.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -100,17 +107,11 @@ def login():
         if user and check_password_hash(user.password, password):
             if not user.is_verified:
                 flash('Please verify your email first!', 'error')
-                return redirect(url_for('login'))
+                return redirect(url_for('main.login'))
             
             # Generate and store OTP
             otp = generate_otp()
-            otp_token = OTPToken(
-                user_id=user.id,
-                otp=otp,
-                expiry=datetime.utcnow() + timedelta(minutes=10)
-            )
-            db.session.add(otp_token)
-            db.session.commit()
+            token_store.issue_otp(user.id, otp, OTP_TTL)
 
             # Store user_id in session for OTP verification
             session['temp_user_id'] = user.id
@@ -118,63 +119,48 @@ def login():
             # Send OTP email
             send_otp_email(user, otp)
             
-            return redirect(url_for('verify_otp'))
+            return redirect(url_for('main.verify_otp'))
         
         flash('Invalid username or password!', 'error')
     return render_template('login.html')
 
-@app.route('/verify-otp', methods=['GET', 'POST'])
+@bp.route('/verify-otp', methods=['GET', 'POST'])
 def verify_otp():
     if 'temp_user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     if request.method == 'POST':
         user_id = session['temp_user_id']
         otp = request.form.get('otp')
         
-        otp_token = OTPToken.query.filter_by(
-            user_id=user_id,
-            otp=otp,
-            is_used=False
-        ).order_by(OTPToken.created_at.desc()).first()
-
-        if otp_token and otp_token.expiry > datetime.utcnow():
+        if otp and token_store.consume_otp(user_id, otp):
             user = User.query.get(user_id)
-            otp_token.is_used = True
-            db.session.commit()
-            
             login_user(user)
             session.pop('temp_user_id', None)
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         
         flash('Invalid or expired OTP!', 'error')
     
     return render_template('verify_otp.html')
 
-@app.route('/resend-otp', methods=['POST'])
+@bp.route('/resend-otp', methods=['POST'])
 def resend_otp():
     if 'temp_user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     user = User.query.get(session['temp_user_id'])
     if user:
         # Generate and store new OTP
         otp = generate_otp()
-        otp_token = OTPToken(
-            user_id=user.id,
-            otp=otp,
-            expiry=datetime.utcnow() + timedelta(minutes=10)
-        )
-        db.session.add(otp_token)
-        db.session.commit()
+        token_store.issue_otp(user.id, otp, OTP_TTL)
 
         # Send new OTP email
         send_otp_email(user, otp)
         flash('New OTP has been sent to your email!', 'success')
     
-    return redirect(url_for('verify_otp'))
+    return redirect(url_for('main.verify_otp'))
 
-@app.route('/forgot-password', methods=['GET', 'POST'])
+@bp.route('/forgot-password', methods=['GET', 'POST'])
 def forgot_password():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -182,48 +168,40 @@ def forgot_password():
         
         if user:
             token = secrets.token_urlsafe(32)
-            ver_token = VerificationToken(
-                user_id=user.id,
-                token=token,
-                expiry=datetime.utcnow() + timedelta(hours=1)
-            )
-            db.session.add(ver_token)
-            db.session.commit()
-
-            reset_url = url_for('reset_password', token=token, _external=True)
+            token_store.issue_token(user.id, token, RESET_PASSWORD_TTL)
+
+            reset_url = url_for('main.reset_password', token=token, _external=True)
             msg = Message('Reset Your Password',
                          sender='noreply@shareportfolio.com',
                          recipients=[email])
             msg.html = render_template('emails/reset_password.html',
                                      reset_url=reset_url,
                                      year=datetime.utcnow().year)
-            mail.send(msg)
+            mail_outbox.send(msg)
             
             flash('Password reset instructions sent to your email!', 'success')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         
         flash('Email not found!', 'error')
     return render_template('forgot_password.html')
 
-@app.route('/verify_email/<token>')
+@bp.route('/verify_email/<token>')
 def verify_email(token):
-    ver_token = VerificationToken.query.filter_by(token=token).first()
-    if ver_token and ver_token.expiry > datetime.utcnow():
-        user = User.query.get(ver_token.user_id)
+    user_id = token_store.consume_token(token)
+    if user_id is not None:
+        user = User.query.get(user_id)
         user.is_verified = True
-        db.session.delete(ver_token)
         db.session.commit()
         flash('Email verified successfully!', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     flash('Invalid or expired verification link!', 'error')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/reset-password/<token>', methods=['GET', 'POST'])
+@bp.route('/reset-password/<token>', methods=['GET', 'POST'])
 def reset_password(token):
-    ver_token = VerificationToken.query.filter_by(token=token).first()
-    if not ver_token or ver_token.expiry < datetime.utcnow():
+    if token_store.peek_token(token) is None:
         flash('Invalid or expired reset link!', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     if request.method == 'POST':
         password = request.form.get('password')
@@ -231,82 +209,258 @@ def reset_password(token):
 
         if password != confirm_password:
             flash('Passwords do not match!', 'error')
-            return redirect(url_for('reset_password', token=token))
-
-        user = User.query.get(ver_token.user_id)
+            return redirect(url_for('main.reset_password', token=token))
+
+        # Used up here, so a link can't reset the password twice
+        user_id = token_store.consume_token(token)
+        if user_id is None:
+            flash('Invalid or expired reset link!', 'error')
+            return redirect(url_for('main.login'))
+        user = User.query.get(user_id)
         user.password = generate_password_hash(password)
-        db.session.delete(ver_token)
         db.session.commit()
 
         flash('Password reset successful!', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     return render_template('reset_password.html')
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 @login_required
 def dashboard():
-    accounts = TradingAccount.query.filter_by(user_id=current_user.id).all()
-    portfolio_summary = {}
-    total_portfolio = {
-        'total_investment': 0,
-        'current_value': 0,
-        'profit_loss': 0,
-        'profit_loss_percentage': 0
-    }
-
-    for account in accounts:
-        summary = {
-            'total_investment': 0,
-            'current_value': 0,
-            'profit_loss': 0,
-            'profit_loss_percentage': 0
-        }
-        
-        for share in account.shares:
-            # Update share price in database
-            current_price = get_share_price(share.name)
-            if current_price:
-                share_price = SharePrice(
-                    share_name=share.name,
-                    current_price=current_price
-                )
-                db.session.add(share_price)
-                db.session.commit()
-
-            summary['total_investment'] += share.total_investment
-            summary['current_value'] += share.current_value
-            summary['profit_loss'] += share.profit_loss
-        
-        if summary['total_investment'] > 0:
-            summary['profit_loss_percentage'] = (summary['profit_loss'] / summary['total_investment']) * 100
-        
-        portfolio_summary[account.id] = summary
-        
-        total_portfolio['total_investment'] += summary['total_investment']
-        total_portfolio['current_value'] += summary['current_value']
-        total_portfolio['profit_loss'] += summary['profit_loss']
-    
-    if total_portfolio['total_investment'] > 0:
-        total_portfolio['profit_loss_percentage'] = (total_portfolio['profit_loss'] / total_portfolio['total_investment']) * 100
+    fresh_prices = {}
+    if not current_app.config['PRICE_WORKER_ENABLED']:
+        # Imported here so app startup doesn't load the scraper and parser stack
+        from share_scraper import get_share_prices
+
+        # Refresh prices for every distinct symbol across all accounts at once
+        symbols = [name for (name,) in db.session.query(Share.name)
+                   .join(TradingAccount)
+                   .filter(TradingAccount.user_id == current_user.id)
+                   .distinct()]
+        # Shown as returned; the tick buffer stores them in the background
+        fresh_prices = get_share_prices(symbols)
+
+    # Summary cards come from the incrementally maintained aggregate rows
+    portfolio_summary, total_portfolio = aggregates.load_summaries(current_user.id)
+
+    # Load holdings after anything that may commit (the price refresh, a first
+    # aggregate rebuild) so they and their attached prices aren't expired;
+    # all accounts' shares come in one extra query instead of one per account
+    accounts = TradingAccount.query.filter_by(user_id=current_user.id)\
+        .options(selectinload(TradingAccount.shares))\
+        .all()
+    attach_latest_prices((share for account in accounts for share in account.shares), fresh_prices)
+
+    alerts = PriceAlert.query.filter_by(user_id=current_user.id, triggered_at=None)\
+        .order_by(PriceAlert.share_name, PriceAlert.id)\
+        .all()
+    held_symbols = sorted({share.name for account in accounts for share in account.shares})
 
     return render_template('dashboard.html',
                          accounts=accounts,
                          portfolio_summary=portfolio_summary,
-                         total_portfolio=total_portfolio)
+                         total_portfolio=total_portfolio,
+                         alerts=alerts,
+                         held_symbols=held_symbols)
+
+def _holdings_snapshot(user_id):
+    """Plain (id, account_id, name, quantity, buying_price) rows for a user's holdings"""
+    return db.session.query(Share.id, Share.account_id, Share.name, Share.quantity, Share.buying_price)\
+        .join(TradingAccount)\
+        .filter(TradingAccount.user_id == user_id)\
+        .all()
+
+def _price_event(account_ids, holdings, prices, changed):
+    """Changed holding rows plus recomputed account and portfolio totals"""
+    shares = []
+    values = []
+    for share_id, account_id, name, quantity, buying_price in holdings:
+        figures = holding_values(quantity, buying_price, prices.get(name))
+        values.append((account_id, figures['total_investment'], figures['current_value']))
+        if name in changed:
+            shares.append(dict(figures, id=share_id))
+    portfolio_summary, total_portfolio = summarize(account_ids, values)
+    return {'shares': shares, 'accounts': portfolio_summary, 'total': total_portfolio}
+
+@bp.route('/dashboard/stream')
+@login_required
+def dashboard_stream():
+    """Server-Sent Events feed of price changes for the user's holdings"""
+    account_ids = [account_id for (account_id,) in db.session.query(TradingAccount.id)
+                   .filter_by(user_id=current_user.id)]
+    holdings = _holdings_snapshot(current_user.id)
+    symbols = {name for _, _, name, _, _ in holdings}
+    prices = {name: quote.current_price for name, quote in load_latest_prices(symbols).items()}
+    subscription = price_broadcaster.subscribe(symbols, prices)
+
+    # Runs after the request context is gone, so it must not touch the DB
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                changes = subscription.get(timeout=15)
+                if changes is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                prices.update(changes)
+                event = _price_event(account_ids, holdings, prices, changes)
+                yield f"event: prices\ndata: {json.dumps(event)}\n\n"
+        finally:
+            price_broadcaster.unsubscribe(subscription)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Request, SQL, scraper and cache metrics in the Prometheus text format"""
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+# Quotes are stamped before they commit, so deltas overlap the previous window
+API_DELTA_LOOKBACK = timedelta(seconds=30)
+
+def _parse_since(value):
+    try:
+        # Offsets such as +05:30 are converted; stored times are naive UTC
+        return naive_utc(datetime.fromisoformat(value)) - API_DELTA_LOOKBACK
+    except (TypeError, ValueError):
+        return None
+
+@bp.route('/api/bars/<symbol>')
+@login_required
+def api_bars(symbol):
+    """OHLCV bars from the bar store; ``interval``, ``start`` and ``end`` are optional"""
+    interval = request.args.get('interval', '1d')
+    if not bar_store.enabled or interval not in BAR_INTERVALS:
+        return jsonify({'error': 'Unknown interval or bar store disabled'}), 400
+    try:
+        # Offsets such as +05:30 are converted; the bar store works in naive UTC
+        start, end = (naive_utc(datetime.fromisoformat(request.args[name])) if request.args.get(name) else None
+                      for name in ('start', 'end'))
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO dates'}), 400
+    bars = bar_store.read(symbol, interval, start=start, end=end)
+    return jsonify({'symbol': symbol, 'interval': interval,
+                    **{name: column.tolist() for name, column in bars.items()}})
+
+@bp.route('/api/analytics')
+@login_required
+def api_analytics():
+    """Portfolio risk and return figures (XIRR, volatility, drawdown, beta, weights) as JSON"""
+    from analytics import portfolio_analytics, load_sector_map
+
+    sectors = load_sector_map(current_app.config.get('SECTOR_MAP_FILE'))
+    return jsonify(portfolio_analytics(current_user.id, sectors=sectors))
 
-@app.route('/add_account', methods=['POST'])
+@bp.route('/api/portfolio')
+@login_required
+def api_portfolio():
+    """Holdings, account summaries and totals as JSON.
+
+    Sends a strong ETag built from the holdings and their quote timestamps
+    and answers a matching If-None-Match with 304. With ``since=<as_of>``
+    from a previous response, only holdings added or repriced after it are
+    listed; ``share_ids`` lets the client drop removed ones.
+    """
+    as_of = datetime.utcnow()
+    accounts = db.session.query(TradingAccount.id, TradingAccount.name)\
+        .filter_by(user_id=current_user.id)\
+        .order_by(TradingAccount.id)\
+        .all()
+    holdings = db.session.query(Share.id, Share.account_id, Share.name, Share.quantity,
+                                Share.buying_price, Share.created_at)\
+        .join(TradingAccount)\
+        .filter(TradingAccount.user_id == current_user.id)\
+        .order_by(Share.id)\
+        .all()
+    quotes = load_latest_prices({holding.name for holding in holdings})
+
+    version = hashlib.sha1()
+    for account_id, name in accounts:
+        version.update(f"a{account_id}:{name}|".encode())
+    for holding in holdings:
+        quote = quotes.get(holding.name)
+        version.update(f"s{holding.id}:{holding.account_id}:{holding.name}:{holding.quantity}:"
+                       f"{holding.buying_price}:{quote.last_updated.isoformat() if quote else ''}|".encode())
+    etag = version.hexdigest()
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    since = _parse_since(request.args.get('since'))
+    rows = []
+    values = []
+    for holding in holdings:
+        quote = quotes.get(holding.name)
+        figures = holding_values(holding.quantity, holding.buying_price, quote.current_price if quote else None)
+        values.append((holding.account_id, figures['total_investment'], figures['current_value']))
+        if since is not None and holding.created_at < since and (not quote or quote.last_updated < since):
+            continue
+        rows.append(dict(
+            figures,
+            id=holding.id,
+            account_id=holding.account_id,
+            name=holding.name,
+            quantity=holding.quantity,
+            buying_price=holding.buying_price,
+            price_updated=quote.last_updated.isoformat() if quote else None
+        ))
+    portfolio_summary, total_portfolio = summarize([account_id for account_id, _ in accounts], values)
+
+    payload = {
+        'as_of': as_of.isoformat(),
+        'holdings': rows,
+        'accounts': [dict(portfolio_summary[account_id], id=account_id, name=name)
+                     for account_id, name in accounts],
+        'total': total_portfolio
+    }
+    if since is not None:
+        payload['share_ids'] = [holding.id for holding in holdings]
+
+    response = jsonify(payload)
+    response.set_etag(etag)
+    return response
+
+@bp.route('/add_account', methods=['POST'])
 @login_required
 def add_account():
     name = request.form.get('name')
     if name:
         account = TradingAccount(name=name, user_id=current_user.id)
         db.session.add(account)
+        aggregates.on_account_added(account)
         db.session.commit()
         flash('Account added successfully!', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
+
+@bp.route('/remove_account/<int:account_id>', methods=['POST'])
+@login_required
+def remove_account(account_id):
+    account = TradingAccount.query.filter_by(id=account_id, user_id=current_user.id).first_or_404()
+    
+    try:
+        # Delete associated shares and aggregates first (due to foreign key constraints)
+        aggregates.on_account_removed(account)
+        Share.query.filter_by(account_id=account_id).delete()
+        
+        # Delete the account
+        db.session.delete(account)
+        db.session.commit()
+        
+        flash('Trading account removed successfully', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Error removing trading account. Please try again.', 'danger')
+        current_app.logger.error(f"Error removing account {account_id}: {str(e)}")
+    
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/add_share', methods=['POST'])
+@bp.route('/add_share', methods=['POST'])
 @login_required
 def add_share():
     account_id = request.form.get('account_id')
@@ -315,29 +469,113 @@ def add_share():
     buying_price = request.form.get('buying_price')
 
     if all([account_id, share_name, quantity, buying_price]):
+        account = TradingAccount.query.filter_by(id=int(account_id), user_id=current_user.id).first_or_404()
         share = Share(
             name=share_name,
             quantity=int(quantity),
             buying_price=float(buying_price),
-            account_id=int(account_id)
+            account_id=account.id
         )
         db.session.add(share)
+        aggregates.on_share_added(share, account.user_id)
         db.session.commit()
         flash('Share added successfully!', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/remove_share/<int:share_id>', methods=['POST'])
+@bp.route('/import_holdings', methods=['POST'])
+@login_required
+def import_holdings_upload():
+    """Bulk-add holdings to an account from an uploaded broker CSV or contract note"""
+    account = TradingAccount.query.filter_by(id=request.form.get('account_id', type=int),
+                                             user_id=current_user.id).first_or_404()
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        if wants_json:
+            return jsonify({'error': 'no file uploaded'}), 400
+        flash('Choose a CSV file to import.', 'error')
+        return redirect(url_for('main.dashboard'))
+
+    try:
+        # Decoded and parsed line by line from the spooled upload
+        result = import_holdings(codecs.iterdecode(upload.stream, 'utf-8-sig'), account,
+                                 allow_unknown=bool(request.form.get('allow_unknown')))
+    except (HoldingsImportError, UnicodeDecodeError) as e:
+        if wants_json:
+            return jsonify({'error': str(e)}), 400
+        flash(f'Could not import {upload.filename}: {e}', 'error')
+        return redirect(url_for('main.dashboard'))
+
+    if not current_app.config['PRICE_WORKER_ENABLED']:
+        # Quotes arrive through the tick buffer; the response doesn't wait for them
+        prewarm_prices_in_background(result['symbols'])
+
+    if wants_json:
+        return jsonify(result)
+    flash(f"Imported {result['imported']} holdings into {account.name}"
+          + (f", skipped {result['skipped']} rows." if result['skipped'] else '.'), 'success')
+    for line, message in result['errors'][:5]:
+        flash(f'Line {line}: {message}', 'error')
+    return redirect(url_for('main.dashboard'))
+
+@bp.route('/remove_share/<int:share_id>', methods=['POST'])
 @login_required
 def remove_share(share_id):
     share = Share.query.get_or_404(share_id)
     if share.account.user_id == current_user.id:
         db.session.delete(share)
+        aggregates.on_share_removed(share, current_user.id)
         db.session.commit()
         flash('Share removed successfully!', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/logout')
+@bp.route('/add_alert', methods=['POST'])
+@login_required
+def add_alert():
+    share_name = request.form.get('share_name', '').strip()
+    kind = request.form.get('kind')
+    try:
+        value = float(request.form.get('value', ''))
+    except ValueError:
+        value = 0
+
+    held = db.session.query(Share.id).join(TradingAccount)\
+        .filter(TradingAccount.user_id == current_user.id, Share.name == share_name)\
+        .first()
+    quote = load_latest_prices([share_name]).get(share_name)
+    if kind not in ('cross', 'move') or value <= 0 or not held:
+        flash('Choose one of your shares and a positive alert value.', 'error')
+    elif quote is None:
+        flash(f'No price is available for {share_name} yet, try again later.', 'error')
+    elif kind == 'cross' and value == quote.current_price:
+        flash(f'{share_name} is already at ₹{value:.2f}.', 'error')
+    else:
+        above_price, below_price = thresholds(kind, value, quote.current_price)
+        db.session.add(PriceAlert(
+            user_id=current_user.id,
+            share_name=share_name,
+            kind=kind,
+            value=value,
+            reference_price=quote.current_price,
+            above_price=above_price,
+            below_price=below_price
+        ))
+        db.session.commit()
+        flash('Price alert added successfully!', 'success')
+    return redirect(url_for('main.dashboard'))
+
+@bp.route('/remove_alert/<int:alert_id>', methods=['POST'])
+@login_required
+def remove_alert(alert_id):
+    alert = PriceAlert.query.filter_by(id=alert_id, user_id=current_user.id).first_or_404()
+    db.session.delete(alert)
+    db.session.commit()
+    alert_index.remove(alert_id)
+    flash('Price alert removed successfully!', 'success')
+    return redirect(url_for('main.dashboard'))
+
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
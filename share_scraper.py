@@ -1,145 +1,228 @@
-import requests
-from bs4 import BeautifulSoup
 import logging
+import os
+import time
 from datetime import datetime
 import json
-from models import SharePrice, db
+from models import db, load_latest_prices
+from price_store import load_exchanges, record_exchanges
+from extensions import tick_buffer, metrics
+from quote_cache import QuoteCache
+from http_client import client
+from quote_parser import clean_number, parse_price, parse_constituents
 from time import sleep
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def clean_number(text):
-    """Clean number string by removing commas, spaces, and converting percentage"""
-    if not text:
-        return 0
+PRICE_CACHE_SECONDS = 300  # 5 minutes cache
+MAX_FETCH_WORKERS = 8
+
+# Base of all scraped pages; point it at a local stub server for offline runs
+GOOGLE_FINANCE_URL = os.getenv('GOOGLE_FINANCE_URL', 'https://www.google.com/finance').rstrip('/')
+
+# The NIFTY 50 level is stored as a quote under this symbol (benchmark for analytics)
+NIFTY_INDEX_SYMBOL = '.NSEI'
+
+# In-process layer in front of the LatestQuote table and the scraper
+quote_cache = QuoteCache(ttl=60, negative_ttl=120, max_entries=5000)
+
+def _is_fresh(share_price):
+    """Check whether a stored price is recent enough to skip scraping"""
+    if not share_price or not share_price.last_updated:
+        return False
+    age = datetime.utcnow() - share_price.last_updated
+    return age.total_seconds() < PRICE_CACHE_SECONDS
+
+EXCHANGES = ('NSE', 'BSE')
+
+class ScrapeError(Exception):
+    """Upstream did not answer, so nothing can be concluded about the symbol"""
+
+def _scrape(url, function, exchange, parse, found=bool):
+    """GET ``url`` and ``parse`` the page, recording network and parse time.
+
+    Returns (status_code, parsed); parsed is None unless the page came back
+    with a 200. ``found(parsed)`` decides between the ok and empty outcomes.
+    """
+    started = time.perf_counter()
     try:
-        # Remove currency symbols, commas, spaces, and % symbol
-        cleaned = text.replace('₹', '').replace(',', '').replace(' ', '').replace('%', '').strip()
-        if cleaned:
-            return float(cleaned)
-        return 0
-    except ValueError:
-        return 0
+        response = client.get(url)
+    except Exception:
+        metrics.observe_scrape(function, exchange, 'error', time.perf_counter() - started)
+        raise
+    network = time.perf_counter() - started
+    if response.status_code != 200:
+        metrics.observe_scrape(function, exchange, f'http_{response.status_code}', network)
+        return response.status_code, None
+
+    started = time.perf_counter()
+    parsed = parse(response.text)
+    metrics.observe_scrape(function, exchange, 'ok' if found(parsed) else 'empty', network,
+                           time.perf_counter() - started)
+    return response.status_code, parsed
+
+def _fetch_share_price(share_name, exchange=None):
+    """Scrape the current price from Google Finance.
+
+    Tries the known ``exchange`` first, then the others in NSE, BSE order.
+    Returns (price, exchange), or (None, None) when every page answered but
+    none had a price. Raises ScrapeError on a non-200 response. Only does
+    network work so it is safe to call from worker threads.
+    """
+    exchanges = [exchange] + [e for e in EXCHANGES if e != exchange] if exchange else EXCHANGES
+    for exchange in exchanges:
+        url = f"{GOOGLE_FINANCE_URL}/quote/{share_name}:{exchange}"
+        status, price = _scrape(url, 'quote', exchange, parse_price)
+        if status != 200:
+            raise ScrapeError(f"{url} returned {status}")
+
+        if price:
+            logger.info(f"Successfully fetched price for {share_name} from {exchange}: {price}")
+            return price, exchange
+    return None, None
+
+def _fetch_through_cache(share_name, exchange=None):
+    """Fetch via the quote cache.
+
+    Returns (price, resolution) where resolution is {'exchange': ...} if
+    this call did the scrape, or None if it was served or coalesced.
+    """
+    resolution = {}
+
+    def loader(symbol):
+        price, resolution['exchange'] = _fetch_share_price(symbol, exchange)
+        return price
+
+    # get_share_prices' cache pre-check already counted this lookup as a miss
+    price = quote_cache.get_or_fetch(share_name, loader, counted=True)
+    return price, resolution or None
 
 def get_share_price(share_name):
     """Get current share price from Google Finance"""
+    return get_share_prices([share_name]).get(share_name)
+
+def get_share_prices(share_names):
+    """Get current prices for many shares, fetching cache misses concurrently.
+
+    Symbols are deduplicated, fresh prices are served from the in-process
+    quote cache or the database, and the remaining ones are scraped in a
+    bounded thread pool (concurrent misses for a symbol share one scrape), so the total
+    wait is roughly that of the slowest quote. Returns a dict mapping each
+    requested symbol to its price, or None if it could not be found.
+    """
+    symbols = list(dict.fromkeys(name for name in share_names if name))
+    if not symbols:
+        return {}
+
+    prices = dict.fromkeys(symbols)
     try:
-        # First check if we have a recent price in our database
-        share_price = SharePrice.query.filter_by(share_name=share_name).first()
-        if share_price and (datetime.utcnow() - share_price.last_updated).seconds < 300:  # 5 minutes cache
-            return share_price.current_price
-
-        # If no recent price, scrape from Google Finance
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-        }
+        # Serve what we can from the in-process cache first
+        pending = []
+        for symbol in symbols:
+            found, price = quote_cache.get(symbol)
+            if found:
+                prices[symbol] = price
+            else:
+                pending.append(symbol)
 
-        # Search for the stock on Google Finance
-        search_url = f"https://www.google.com/finance/quote/{share_name}:NSE"
-        response = requests.get(search_url, headers=headers)
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find the price div
-            price_div = soup.find('div', {'class': 'YMlKec fxKbKc'})
-            if price_div:
-                try:
-                    price = clean_number(price_div.text)
-                    if price > 0:
-                        # Update or create price in database
-                        if share_price:
-                            share_price.current_price = price
-                            share_price.last_updated = datetime.utcnow()
-                        else:
-                            share_price = SharePrice(
-                                share_name=share_name,
-                                current_price=price
-                            )
-                            db.session.add(share_price)
-                        
-                        db.session.commit()
-                        logger.info(f"Successfully updated price for {share_name}: {price}")
-                        return price
-                    
-                except ValueError as e:
-                    logger.error(f"Error converting price for {share_name}: {e}")
+        if not pending:
+            return prices
+
+        # Then check if we have recent prices in our database
+        existing = load_latest_prices(pending)
+        misses = []
+        for symbol in pending:
+            if _is_fresh(existing.get(symbol)):
+                prices[symbol] = existing[symbol].current_price
+                quote_cache.put(symbol, prices[symbol])
             else:
-                # Try BSE if NSE fails
-                bse_url = f"https://www.google.com/finance/quote/{share_name}:BSE"
-                bse_response = requests.get(bse_url, headers=headers)
-                if bse_response.status_code == 200:
-                    bse_soup = BeautifulSoup(bse_response.text, 'html.parser')
-                    price_div = bse_soup.find('div', {'class': 'YMlKec fxKbKc'})
-                    if price_div:
-                        try:
-                            price = clean_number(price_div.text)
-                            if price > 0:
-                                if share_price:
-                                    share_price.current_price = price
-                                    share_price.last_updated = datetime.utcnow()
-                                else:
-                                    share_price = SharePrice(
-                                        share_name=share_name,
-                                        current_price=price
-                                    )
-                                    db.session.add(share_price)
-                                
-                                db.session.commit()
-                                logger.info(f"Successfully updated price for {share_name} from BSE: {price}")
-                                return price
-                        except ValueError as e:
-                            logger.error(f"Error converting BSE price for {share_name}: {e}")
-    
-        logger.error(f"Could not find price for {share_name} on Google Finance")
-        return None
-            
+                misses.append(symbol)
+
+        # Skip symbols known to be on neither exchange until their retry time
+        now = datetime.utcnow()
+        exchanges = load_exchanges(misses)
+        to_fetch = []
+        for symbol in misses:
+            known = exchanges.get(symbol)
+            if known and not known.exchange and known.retry_after and known.retry_after > now:
+                quote_cache.put(symbol, None)
+            else:
+                to_fetch.append(symbol)
+
+        if not to_fetch:
+            return prices
+
+        # Scrape the remaining ones from Google Finance in parallel
+        fetched = {}
+        resolved = {}
+        workers = min(MAX_FETCH_WORKERS, len(to_fetch))
+        with metrics.span('scrape'), ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_fetch_through_cache, symbol,
+                                exchanges[symbol].exchange if symbol in exchanges else None): symbol
+                for symbol in to_fetch
+            }
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    price, resolution = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching price for {symbol}: {e}")
+                    continue
+                prices[symbol] = price
+                if not price:
+                    logger.error(f"Could not find price for {symbol} on Google Finance")
+                if resolution is not None:
+                    # Only the request that actually scraped the quote stores it
+                    if price:
+                        fetched[symbol] = price
+                    # Record new or changed exchanges, and push back retries for unknowns
+                    known = exchanges.get(symbol)
+                    if not known or not resolution['exchange'] or known.exchange != resolution['exchange']:
+                        resolved[symbol] = resolution['exchange']
+
+        if fetched:
+            # Written behind by the tick buffer in a shared batch
+            tick_buffer.put(fetched)
+        if resolved:
+            record_exchanges(resolved)
+        return prices
+
     except Exception as e:
-        logger.error(f"Error fetching price for {share_name}: {e}")
-        return None
+        logger.error(f"Error fetching prices for {', '.join(symbols)}: {e}")
+        db.session.rollback()
+        return prices
+
+def _harvest_constituent_prices(shares, index_prices=None):
+    """Bulk-store the LTPs parsed from an index page as regular quotes"""
+    prices = {share['symbol']: share['ltp'] for share in shares if share['symbol'] and share['ltp'] > 0}
+    prices.update({symbol: price for symbol, price in (index_prices or {}).items() if price})
+    if not prices:
+        return
+    try:
+        tick_buffer.put(prices)
+        for symbol, price in prices.items():
+            quote_cache.put(symbol, price)
+        logger.info(f"Queued {len(prices)} constituent prices from index page")
+    except Exception as e:
+        logger.error(f"Error storing constituent prices: {e}")
+        db.session.rollback()
 
 def get_nifty50_shares():
     """Get Nifty 50 shares data"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-        }
-        
-        url = "https://www.google.com/finance/quote/.NSEI:INDEXNSE"
-        response = requests.get(url, headers=headers)
-        
+        url = f"{GOOGLE_FINANCE_URL}/quote/.NSEI:INDEXNSE"
+        # Top 50 shares, plus the index level itself
+        _, parsed = _scrape(url, 'nifty50', 'NSE', lambda html: (parse_constituents(html, 50), parse_price(html)),
+                            found=lambda parsed: bool(parsed[0]))
+
         shares = []
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            constituents = soup.find_all('div', {'class': 'SxcTic'})
-            
-            for constituent in constituents[:50]:  # Get top 50 shares
-                try:
-                    symbol = constituent.find('div', {'class': 'ZvmM7'}).text.strip()
-                    price_div = constituent.find('div', {'class': 'YMlKec'})
-                    change_div = constituent.find('div', {'class': 'JwB6zf'})
-                    
-                    price = clean_number(price_div.text) if price_div else 0
-                    change = clean_number(change_div.text.split('(')[0]) if change_div else 0
-                    change_percent = clean_number(change_div.text.split('(')[1].split(')')[0]) if change_div and '(' in change_div.text else 0
-                    
-                    share_data = {
-                        'symbol': symbol,
-                        'ltp': price,
-                        'change': change,
-                        'percentageChange': change_percent
-                    }
-                    shares.append(share_data)
-                except Exception as e:
-                    logger.error(f"Error parsing Nifty50 constituent data: {e}")
-                    continue
+        if parsed:
+            shares, level = parsed
+            _harvest_constituent_prices(shares, {NIFTY_INDEX_SYMBOL: level})
         
         return shares
     except Exception as e:
@@ -149,40 +232,12 @@ def get_nifty50_shares():
 def get_sensex_shares():
     """Get Sensex shares data"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-        }
+        url = f"{GOOGLE_FINANCE_URL}/quote/.BSESN:INDEXBOM"
+        _, shares = _scrape(url, 'sensex', 'BSE', lambda html: parse_constituents(html, 30))  # Get top 30 shares
         
-        url = "https://www.google.com/finance/quote/.BSESN:INDEXBOM"
-        response = requests.get(url, headers=headers)
-        
-        shares = []
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            constituents = soup.find_all('div', {'class': 'SxcTic'})
-            
-            for constituent in constituents[:30]:  # Get top 30 shares
-                try:
-                    symbol = constituent.find('div', {'class': 'ZvmM7'}).text.strip()
-                    price_div = constituent.find('div', {'class': 'YMlKec'})
-                    change_div = constituent.find('div', {'class': 'JwB6zf'})
-                    
-                    price = clean_number(price_div.text) if price_div else 0
-                    change = clean_number(change_div.text.split('(')[0]) if change_div else 0
-                    change_percent = clean_number(change_div.text.split('(')[1].split(')')[0]) if change_div and '(' in change_div.text else 0
-                    
-                    share_data = {
-                        'symbol': symbol,
-                        'ltp': price,
-                        'change': change,
-                        'percentageChange': change_percent
-                    }
-                    shares.append(share_data)
-                except Exception as e:
-                    logger.error(f"Error parsing Sensex constituent data: {e}")
-                    continue
+        shares = shares or []
+        if shares:
+            _harvest_constituent_prices(shares)
         
         return shares
     except Exception as e:
@@ -192,48 +247,15 @@ def get_sensex_shares():
 def get_top_gainers_losers():
     """Get top gainers and losers from Google Finance"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-        }
-        
-        def scrape_stocks(url):
-            response = requests.get(url, headers=headers)
-            stocks = []
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                constituents = soup.find_all('div', {'class': 'SxcTic'})
-                
-                for constituent in constituents[:5]:  # Get top 5
-                    try:
-                        symbol = constituent.find('div', {'class': 'ZvmM7'}).text.strip()
-                        price_div = constituent.find('div', {'class': 'YMlKec'})
-                        change_div = constituent.find('div', {'class': 'JwB6zf'})
-                        
-                        price = clean_number(price_div.text) if price_div else 0
-                        change = clean_number(change_div.text.split('(')[0]) if change_div else 0
-                        change_percent = clean_number(change_div.text.split('(')[1].split(')')[0]) if change_div and '(' in change_div.text else 0
-                        
-                        stock_data = {
-                            'symbol': symbol,
-                            'ltp': price,
-                            'change': change,
-                            'percentageChange': change_percent
-                        }
-                        stocks.append(stock_data)
-                    except Exception as e:
-                        logger.error(f"Error parsing stock data: {e}")
-                        continue
-            
-            return stocks
+        def scrape_stocks(url, function):
+            _, stocks = _scrape(url, function, 'NSE', lambda html: parse_constituents(html, 5))  # Get top 5
+            return stocks or []
         
         # Get top gainers from NSE
-        gainers = scrape_stocks("https://www.google.com/finance/markets/gainers?hl=en")
+        gainers = scrape_stocks(f"{GOOGLE_FINANCE_URL}/markets/gainers?hl=en", 'gainers')
         
         # Get top losers from NSE
-        losers = scrape_stocks("https://www.google.com/finance/markets/losers?hl=en")
+        losers = scrape_stocks(f"{GOOGLE_FINANCE_URL}/markets/losers?hl=en", 'losers')
         
         return gainers, losers
     except Exception as e:
@@ -257,3 +279,8 @@ def format_share_data(share_data):
     except (ValueError, TypeError) as e:
         logger.error(f"Error formatting share data: {e}")
         return None
+
+if __name__ == '__main__':
+    import sys
+    from price_worker import main
+    sys.exit(main())
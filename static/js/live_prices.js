@@ -0,0 +1,54 @@
+// Patch dashboard prices and totals in place from the /dashboard/stream feed
+(function() {
+    var script = document.currentScript;
+
+    if (!window.EventSource) {
+        // Old browsers: fall back to reloading the page every 5 minutes
+        setTimeout(function() {
+            location.reload();
+        }, 300000);
+        return;
+    }
+
+    var SIGNED_FIELDS = ['profit_loss', 'profit_loss_percentage'];
+
+    function format(field, value) {
+        var text = Number(value).toFixed(2);
+        return field === 'profit_loss_percentage' ? text + '%' : '₹' + text;
+    }
+
+    function setField(element, field, value) {
+        if (!element) {
+            return;
+        }
+        element.textContent = format(field, value);
+        if (SIGNED_FIELDS.indexOf(field) !== -1) {
+            element.classList.toggle('text-success', value >= 0);
+            element.classList.toggle('text-danger', value < 0);
+        }
+    }
+
+    function patch(container, values, attribute) {
+        if (!container) {
+            return;
+        }
+        Object.keys(values).forEach(function(field) {
+            setField(container.querySelector('[' + attribute + '="' + field + '"]'), field, values[field]);
+        });
+    }
+
+    var source = new EventSource(script.getAttribute('data-stream-url'));
+
+    source.addEventListener('prices', function(event) {
+        var data = JSON.parse(event.data);
+
+        data.shares.forEach(function(share) {
+            patch(document.querySelector('tr[data-share-id="' + share.id + '"]'), share, 'data-field');
+        });
+        Object.keys(data.accounts).forEach(function(accountId) {
+            patch(document.querySelector('[data-account-id="' + accountId + '"].row'),
+                  data.accounts[accountId], 'data-field');
+        });
+        patch(document, data.total, 'data-total-field');
+    });
+})();
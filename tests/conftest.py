@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from extensions import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a throwaway SQLite database that never scrapes or sends mail"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'MAIL_SUPPRESS_SEND': True,
+        'PRICE_WORKER_ENABLED': True,
+        'BAR_STORE_PATH': str(tmp_path / 'bars'),
+        'TOKEN_STORE': 'memory',
+        'USER_CACHE_TTL': 0,
+    })
+    with app.app_context():
+        db.create_all()
+    # No context is left pushed, so each test request gets its own session and g
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import aggregates
+from conftest import login
+from extensions import db
+from models import User, TradingAccount, Share, LatestQuote
+
+
+def create_holding(app):
+    with app.app_context():
+        user = User(username='investor', email='investor@example.com', password='x', is_verified=True)
+        db.session.add(user)
+        db.session.flush()
+        account = TradingAccount(name='Broker', user_id=user.id)
+        db.session.add(account)
+        db.session.flush()
+        db.session.add(Share(name='RELIANCE', quantity=10, buying_price=100, account_id=account.id,
+                             created_at=datetime(2026, 1, 1, 12, 0)))
+        db.session.add(LatestQuote(share_name='RELIANCE', current_price=110, last_updated=datetime(2026, 1, 1, 12, 0)))
+        db.session.flush()
+        aggregates.rebuild_user(user.id)
+        db.session.commit()
+        return user.id
+
+
+def test_since_accepts_utc_offsets(app):
+    client = app.test_client()
+    login(client, create_holding(app))
+
+    # 2026-01-01T17:00+05:30 is 11:30 UTC, before the holding was added
+    response = client.get('/api/portfolio', query_string={'since': '2026-01-01T17:00:00+05:30'})
+    assert response.status_code == 200
+    assert [holding['name'] for holding in response.get_json()['holdings']] == ['RELIANCE']
+
+    # 18:00+05:30 is 12:30 UTC, after it
+    response = client.get('/api/portfolio', query_string={'since': '2026-01-01T18:00:00+05:30'})
+    assert response.status_code == 200
+    assert response.get_json()['holdings'] == []
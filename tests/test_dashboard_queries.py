@@ -0,0 +1,53 @@
+from sqlalchemy import event
+
+import aggregates
+from conftest import login
+from extensions import db
+from models import User, TradingAccount, Share, LatestQuote
+
+
+def create_portfolio(app, username, holdings_per_account, accounts=2):
+    """A user with ``accounts`` accounts of distinct, quoted holdings; returns the user id"""
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com', password='x', is_verified=True)
+        db.session.add(user)
+        db.session.flush()
+        for a in range(accounts):
+            account = TradingAccount(name=f'Account {a}', user_id=user.id)
+            db.session.add(account)
+            db.session.flush()
+            for i in range(holdings_per_account):
+                symbol = f'{username.upper()}{a}_{i}'
+                db.session.add(Share(name=symbol, quantity=10, buying_price=100, account_id=account.id))
+                db.session.add(LatestQuote(share_name=symbol, current_price=110))
+        db.session.flush()
+        aggregates.rebuild_user(user.id)
+        db.session.commit()
+        return user.id
+
+
+def count_dashboard_selects(app, user_id, holdings):
+    selects = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            selects.append(statement)
+
+    client = app.test_client()
+    login(client, user_id)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get('/dashboard')
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200
+    assert response.data.count(b'data-share-id') == holdings
+    return len(selects)
+
+
+def test_dashboard_query_count_does_not_grow_with_holdings(app):
+    few = count_dashboard_selects(app, create_portfolio(app, 'small', holdings_per_account=2), holdings=4)
+    many = count_dashboard_selects(app, create_portfolio(app, 'large', holdings_per_account=40), holdings=80)
+    assert few == many
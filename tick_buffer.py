@@ -0,0 +1,171 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class TickBuffer:
+    """Write-behind buffer for scraped price ticks.
+
+    Scrapers enqueue ticks and return without touching the database. One
+    worker thread drains the queue and writes everything that arrived
+    within TICK_BUFFER_FLUSH_MS (or TICK_BUFFER_BATCH_SIZE rows) with a
+    single multi-row insert and LatestQuote upsert, in one transaction.
+    The queue holds at most TICK_BUFFER_MAX_PENDING ticks: producers
+    block while it is full, and write synchronously if it stays full for
+    TICK_BUFFER_PUT_TIMEOUT seconds, so ticks are never dropped.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.batch_size = 500
+        self.flush_interval = 0.2
+        self.max_pending = 10000
+        self.put_timeout = 5
+        self.max_retries = 2
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = self._empty_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('TICK_BUFFER_ENABLED', True)
+        self.batch_size = app.config.get('TICK_BUFFER_BATCH_SIZE', 500)
+        self.flush_interval = app.config.get('TICK_BUFFER_FLUSH_MS', 200) / 1000
+        self.max_pending = app.config.get('TICK_BUFFER_MAX_PENDING', 10000)
+        self.put_timeout = app.config.get('TICK_BUFFER_PUT_TIMEOUT', 5)
+        # Resize rather than replace the queue: a worker started by an earlier
+        # app in this process is blocked on it and would never see a new one
+        with self._queue.mutex:
+            self._queue.maxsize = self.max_pending
+        app.extensions['tick_buffer'] = self
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            'batches': 0,
+            'rows': 0,
+            'max_batch': 0,
+            'flush_seconds': 0.0,
+            'max_flush_seconds': 0.0,
+            'last_flush_seconds': 0.0,
+            'blocked_puts': 0,
+            'overflow_writes': 0,
+            'failed_rows': 0
+        }
+
+    def put(self, prices, timestamp=None):
+        """Queue {share_name: price} quotes taken at ``timestamp`` for writing"""
+        from price_store import record_ticks
+
+        timestamp = timestamp or datetime.utcnow()
+        ticks = [(name, price, timestamp) for name, price in prices.items() if price]
+        if not self.enabled:
+            record_ticks(ticks)
+            return
+
+        self._ensure_worker()
+        for index, tick in enumerate(ticks):
+            try:
+                self._queue.put_nowait(tick)
+                continue
+            except queue.Full:
+                self._count('blocked_puts')
+            try:
+                # Backpressure: wait for the writer to catch up
+                self._queue.put(tick, timeout=self.put_timeout)
+            except queue.Full:
+                logger.warning(f"Tick buffer full for {self.put_timeout}s, writing {len(ticks) - index} ticks inline")
+                self._count('overflow_writes')
+                record_ticks(ticks[index:])
+                return
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self, timeout=10):
+        """Wait up to ``timeout`` seconds for queued ticks to be written"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def stats(self):
+        """Batch size and flush latency counters since start"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['pending'] = self.pending()
+        stats['avg_batch'] = stats['rows'] / stats['batches'] if stats['batches'] else 0
+        stats['avg_flush_seconds'] = stats['flush_seconds'] / stats['batches'] if stats['batches'] else 0
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='tick-buffer', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            with self.app.app_context():
+                self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        from price_store import record_ticks
+        from models import db
+
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                record_ticks(batch)
+            except Exception as e:
+                db.session.rollback()
+                if attempt < self.max_retries:
+                    logger.warning(f"Error writing {len(batch)} ticks, will retry: {e}")
+                    time.sleep(0.5 * (attempt + 1))
+                    continue
+                logger.error(f"Giving up writing {len(batch)} ticks: {e}")
+                self._count('failed_rows', len(batch))
+                return
+            finally:
+                db.session.remove()
+
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self._stats['batches'] += 1
+                self._stats['rows'] += len(batch)
+                self._stats['max_batch'] = max(self._stats['max_batch'], len(batch))
+                self._stats['flush_seconds'] += elapsed
+                self._stats['last_flush_seconds'] = elapsed
+                self._stats['max_flush_seconds'] = max(self._stats['max_flush_seconds'], elapsed)
+            return
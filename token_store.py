@@ -0,0 +1,218 @@
+"""Expiring login OTPs and email verification / password reset tokens.
+
+Backends, chosen by the TOKEN_STORE setting:
+
+- ``db`` (default): the OTPToken and VerificationToken tables, looked up
+  through their indexes; expired and used rows are removed by
+  ``flask purge-tokens``.
+- ``redis``: keys with a TTL on any Redis-protocol server (TOKEN_STORE_URL),
+  so nothing needs purging and logins never write to the database.
+- ``memory``: a per-process dict, for development and tests only since
+  tokens are not shared between workers.
+
+Consuming a token is atomic in every backend, so an OTP or link can only
+be used once even when two requests race.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('db', 'redis', 'memory')
+
+def _seconds(ttl):
+    return ttl.total_seconds() if isinstance(ttl, timedelta) else float(ttl)
+
+class DatabaseTokenBackend:
+    def issue_otp(self, user_id, otp, ttl):
+        from models import OTPToken, db
+        db.session.add(OTPToken(user_id=user_id, otp=otp,
+                                expiry=datetime.utcnow() + timedelta(seconds=_seconds(ttl))))
+        db.session.commit()
+
+    def consume_otp(self, user_id, otp):
+        from models import OTPToken, db
+        # One conditional delete, so a code can't be used twice
+        consumed = OTPToken.query.filter(OTPToken.user_id == user_id, OTPToken.otp == otp,
+                                         OTPToken.is_used.is_(False), OTPToken.expiry > datetime.utcnow())\
+            .delete(synchronize_session=False)
+        db.session.commit()
+        return consumed > 0
+
+    def issue_token(self, user_id, token, ttl):
+        from models import VerificationToken, db
+        db.session.add(VerificationToken(user_id=user_id, token=token,
+                                         expiry=datetime.utcnow() + timedelta(seconds=_seconds(ttl))))
+        db.session.commit()
+
+    def peek_token(self, token):
+        from models import VerificationToken, db
+        row = db.session.query(VerificationToken.user_id)\
+            .filter(VerificationToken.token == token, VerificationToken.expiry > datetime.utcnow())\
+            .first()
+        return row[0] if row else None
+
+    def consume_token(self, token):
+        from models import VerificationToken, db
+        user_id = self.peek_token(token)
+        if user_id is None:
+            return None
+        consumed = VerificationToken.query.filter_by(token=token).delete(synchronize_session=False)
+        db.session.commit()
+        return user_id if consumed else None
+
+    def purge(self):
+        from models import OTPToken, VerificationToken, db
+        now = datetime.utcnow()
+        removed = OTPToken.query.filter((OTPToken.expiry <= now) | OTPToken.is_used.is_(True))\
+            .delete(synchronize_session=False)
+        removed += VerificationToken.query.filter(VerificationToken.expiry <= now)\
+            .delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+
+class RedisTokenBackend:
+    """Keys expire on the server; works with Redis or any protocol-compatible stand-in"""
+
+    def __init__(self, url, prefix='share_portfolio:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _otp_key(self, user_id, otp):
+        return f'{self.prefix}otp:{user_id}:{otp}'
+
+    def _token_key(self, token):
+        return f'{self.prefix}token:{token}'
+
+    def issue_otp(self, user_id, otp, ttl):
+        self.client.set(self._otp_key(user_id, otp), 1, ex=max(1, int(_seconds(ttl))))
+
+    def consume_otp(self, user_id, otp):
+        return self.client.delete(self._otp_key(user_id, otp)) > 0
+
+    def issue_token(self, user_id, token, ttl):
+        self.client.set(self._token_key(token), user_id, ex=max(1, int(_seconds(ttl))))
+
+    def peek_token(self, token):
+        value = self.client.get(self._token_key(token))
+        return int(value) if value is not None else None
+
+    def consume_token(self, token):
+        # GET and DEL in one MULTI, so only one caller sees the deletion
+        pipe = self.client.pipeline()
+        pipe.get(self._token_key(token))
+        pipe.delete(self._token_key(token))
+        value, deleted = pipe.execute()
+        return int(value) if value is not None and deleted else None
+
+    def purge(self):
+        return 0  # expired keys are dropped by the server
+
+class MemoryTokenBackend:
+    """Per-process dict with expiry times; swept on purge and every SWEEP_EVERY issues"""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._entries = {}  # key -> (user_id, expires_at)
+        self._lock = threading.Lock()
+        self._issued = 0
+
+    def _put(self, key, user_id, ttl):
+        with self._lock:
+            self._entries[key] = (user_id, time.time() + _seconds(ttl))
+            self._issued += 1
+            if self._issued % self.SWEEP_EVERY == 0:
+                self._sweep()
+
+    def _get(self, key, remove):
+        with self._lock:
+            entry = self._entries.pop(key, None) if remove else self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def _sweep(self):
+        # Caller must hold the lock
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        return len(expired)
+
+    def issue_otp(self, user_id, otp, ttl):
+        self._put(('otp', user_id, otp), user_id, ttl)
+
+    def consume_otp(self, user_id, otp):
+        return self._get(('otp', user_id, otp), remove=True) is not None
+
+    def issue_token(self, user_id, token, ttl):
+        self._put(('token', token), user_id, ttl)
+
+    def peek_token(self, token):
+        return self._get(('token', token), remove=False)
+
+    def consume_token(self, token):
+        return self._get(('token', token), remove=True)
+
+    def purge(self):
+        with self._lock:
+            return self._sweep()
+
+def create_backend(config):
+    """Build the backend named by the TOKEN_STORE setting"""
+    name = (config.get('TOKEN_STORE') or 'db').lower()
+    if name == 'db':
+        return DatabaseTokenBackend()
+    if name == 'redis':
+        if not config.get('TOKEN_STORE_URL'):
+            raise ValueError("TOKEN_STORE_URL must be set for the redis token store")
+        return RedisTokenBackend(config['TOKEN_STORE_URL'], config.get('TOKEN_STORE_PREFIX', 'share_portfolio:'))
+    if name == 'memory':
+        return MemoryTokenBackend()
+    raise ValueError(f"Unknown token store {name!r} (expected one of {', '.join(BACKENDS)})")
+
+class TokenStore:
+    """Issues and consumes login OTPs and verification tokens through the configured backend"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.backend = create_backend(app.config)
+        app.extensions['token_store'] = self
+
+    def issue_otp(self, user_id, otp, ttl):
+        """Store a login code valid for ``ttl`` (timedelta or seconds)"""
+        self.backend.issue_otp(user_id, otp, ttl)
+
+    def consume_otp(self, user_id, otp):
+        """True if ``otp`` is a live code for the user; it can't be used again"""
+        return self.backend.consume_otp(user_id, otp)
+
+    def issue_token(self, user_id, token, ttl):
+        """Store an email verification or password reset token"""
+        self.backend.issue_token(user_id, token, ttl)
+
+    def peek_token(self, token):
+        """The user id of a live token, without using it up"""
+        return self.backend.peek_token(token)
+
+    def consume_token(self, token):
+        """The user id of a live token, which is removed; None if invalid or expired"""
+        return self.backend.consume_token(token)
+
+    def purge(self):
+        """Remove expired and used tokens; returns how many"""
+        removed = self.backend.purge()
+        if removed:
+            logger.info(f"Purged {removed} expired tokens")
+        return removed
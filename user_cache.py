@@ -0,0 +1,79 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from quote_cache import QuoteCache
+
+class UserCache:
+    """Short-lived cache of User rows for Flask-Login's user loader.
+
+    Authenticated requests rebuild ``current_user`` from the cached
+    column values and merge it into the session without a SELECT.
+    Entries live for USER_CACHE_TTL seconds (0 disables the cache) and
+    are dropped as soon as a change to a user's password or verification
+    state commits in this process; other processes see it within the TTL.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.ttl = 30
+        self._cache = QuoteCache(ttl=self.ttl, max_entries=10000)
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config.get('USER_CACHE_TTL', 30)
+        self._cache = QuoteCache(ttl=self.ttl, max_entries=app.config.get('USER_CACHE_MAX_ENTRIES', 10000))
+        app.extensions['user_cache'] = self
+        if not self._listening:
+            self._listen()
+
+    def _listen(self):
+        from models import User
+
+        event.listen(User.password, 'set', self._on_change)
+        event.listen(User.is_verified, 'set', self._on_change)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_soft_rollback', self._after_rollback)
+        self._listening = True
+
+    def load(self, user_id):
+        """The User with ``user_id`` attached to the current session, or None"""
+        from models import User, db
+
+        if self.ttl <= 0:
+            return db.session.get(User, user_id)
+        found, values = self._cache.get(user_id)
+        if not found:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                self._cache.put(user_id, {attr.key: getattr(user, attr.key)
+                                          for attr in User.__mapper__.column_attrs})
+            return user
+
+        # Rebuild as a clean, persistent instance without touching the database
+        user = User.__mapper__.class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(user, key, value)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def invalidate(self, user_id=None):
+        self._cache.invalidate(user_id)
+
+    def _on_change(self, target, value, oldvalue, initiator):
+        if target.id is None:
+            return
+        self.invalidate(target.id)
+        # Again once the change commits, in case a request cached the old row meanwhile
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop('changed_user_ids', ()):
+            self.invalidate(user_id)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop('changed_user_ids', None)